@@ -1,6 +1,8 @@
 from django.contrib import admin
 
+from .forms import FLAG
 from .models import Comment, News
+from .moderation import moderate_comments
 
 
 class CommentInline(admin.StackedInline):
@@ -13,3 +15,16 @@ class NewsAdmin(admin.ModelAdmin):
     inlines = [
         CommentInline,
     ]
+    actions = ('delete_bad_comments', 'flag_bad_comments')
+
+    @admin.action(description='Удалить комментарии с запрещёнными словами')
+    def delete_bad_comments(self, request, queryset):
+        report = moderate_comments(Comment.objects.filter(news__in=queryset))
+        self.message_user(request, str(report))
+
+    @admin.action(description='Пометить комментарии с запрещёнными словами')
+    def flag_bad_comments(self, request, queryset):
+        report = moderate_comments(
+            Comment.objects.filter(news__in=queryset), FLAG
+        )
+        self.message_user(request, str(report))
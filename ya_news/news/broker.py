@@ -0,0 +1,96 @@
+import asyncio
+import threading
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+# Сколько непрочитанных сообщений ждёт медленного подписчика;
+# лишние отбрасываются, чтобы один клиент не копил память.
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+def comments_channel(news_id):
+    return f'news:{news_id}:comments'
+
+
+class Broker(ABC):
+    """
+    Интерфейс публикации и подписки на сообщения.
+
+    publish вызывается из синхронного кода (представлений),
+    subscribe — из асинхронного. Брокер для нескольких процессов
+    (например, на Redis pub/sub) реализует эти же два метода.
+    """
+
+    @abstractmethod
+    def publish(self, channel, message):
+        """Отправляет сообщение всем подписчикам канала."""
+
+    @abstractmethod
+    def subscribe(self, channel):
+        """
+        Асинхронный контекстный менеджер с очередью сообщений канала.
+
+        Сообщения из очереди читаются через await queue.get().
+        """
+
+
+def deliver(queue, message):
+    try:
+        queue.put_nowait(message)
+    except asyncio.QueueFull:
+        pass
+
+
+class InProcessBroker(Broker):
+    """
+    Брокер в памяти процесса.
+
+    Подписчики живут в цикле событий ASGI-сервера, а публикуют
+    синхронные представления из других потоков, поэтому сообщения
+    передаются в цикл через call_soon_threadsafe.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = tuple(self._subscribers.get(channel, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(deliver, queue, message)
+            except RuntimeError:
+                # Цикл событий подписчика уже закрыт.
+                pass
+
+    @asynccontextmanager
+    async def subscribe(self, channel):
+        subscriber = (
+            asyncio.get_running_loop(),
+            asyncio.Queue(SUBSCRIBER_QUEUE_SIZE),
+        )
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(subscriber)
+        try:
+            yield subscriber[1]
+        finally:
+            with self._lock:
+                subscribers = self._subscribers[channel]
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[channel]
+
+    def subscribers_count(self, channel):
+        with self._lock:
+            return len(self._subscribers.get(channel, ()))
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    """Брокер из настройки NEWS_COMMENT_BROKER, один на процесс."""
+    return import_string(settings.NEWS_COMMENT_BROKER)()
@@ -0,0 +1,90 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+HOME_PAGE_VERSION_KEY = 'news:home:version'
+
+
+def get_cache():
+    """Кэш приложения; бэкенд выбирается в настройках проекта."""
+    return caches[settings.NEWS_CACHE_ALIAS]
+
+
+def news_version_key(news_id):
+    return f'news:{news_id}:version'
+
+
+def get_versions(*keys):
+    """
+    Текущие поколения закэшированных данных.
+
+    Пропавший счётчик (кэш очищен или вытеснен) начинается заново
+    с текущего времени в наносекундах — так новое поколение
+    не совпадёт ни с одним из прежних.
+    """
+    cache = get_cache()
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return versions
+
+
+def bump_version(key):
+    """
+    Делает все данные, сохранённые под прежним поколением, устаревшими.
+
+    Поколение увеличивается атомарно (incr), поэтому одновременные
+    изменения не теряются.
+    """
+    cache = get_cache()
+    now = time.time_ns()
+    if not cache.add(key, now, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, now, timeout=None)
+
+
+def bump_news_versions(news_ids):
+    """
+    После фиксации транзакции сбрасывает поколения новостей
+    и главной страницы.
+
+    Нужен массовым изменениям, которые не вызывают сигналов.
+    """
+    for news_id in news_ids:
+        transaction.on_commit(
+            lambda key=news_version_key(news_id): bump_version(key)
+        )
+    transaction.on_commit(lambda: bump_version(HOME_PAGE_VERSION_KEY))
+
+
+def home_page_key():
+    """Ключ списка новостей на главной странице."""
+    version = get_versions(HOME_PAGE_VERSION_KEY)[HOME_PAGE_VERSION_KEY]
+    return f'news:home:{version}'
+
+
+def news_block_keys(news_ids):
+    """Ключи отрендеренных блоков новостей главной страницы."""
+    version_keys = {news_id: news_version_key(news_id) for news_id in news_ids}
+    versions = get_versions(*version_keys.values())
+    return {
+        news_id: f'news:{news_id}:block:{versions[key]}'
+        for news_id, key in version_keys.items()
+    }
+
+
+def comment_page_key(news_id, cursor):
+    """
+    Ключ отрендеренной страницы комментариев.
+
+    Поколение новости сбрасывается при любом изменении её комментариев.
+    """
+    version_key = news_version_key(news_id)
+    version = get_versions(version_key)[version_key]
+    return f'news:{news_id}:comments:{version}:{cursor or ""}'
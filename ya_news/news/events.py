@@ -0,0 +1,101 @@
+import asyncio
+import json
+import re
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.template.loader import render_to_string
+
+from .broker import comments_channel, get_broker
+from .models import News
+
+EVENTS_PATH = re.compile(r'^/news/(?P<pk>\d+)/events/$')
+
+
+def publish_comment(comment):
+    """Отправляет новый комментарий подписчикам ленты новости."""
+    get_broker().publish(comments_channel(comment.news_id), {
+        'id': comment.pk,
+        'author_id': comment.author_id,
+        'html': render_to_string('news/comment.html', {'comment': comment}),
+    })
+
+
+def format_event(message):
+    return (
+        f'event: comment\nid: {message["id"]}\n'
+        f'data: {json.dumps(message, ensure_ascii=False)}\n\n'
+    ).encode()
+
+
+async def wait_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def stream_comments(news_id, send, receive, heartbeat):
+    """
+    Пересылает клиенту новые комментарии, пока он не отключится.
+
+    Простаивающий подписчик — это только очередь и ожидающая
+    корутина, поэтому один процесс держит тысячи соединений.
+    Комментарий-пинг раз в heartbeat секунд не даёт прокси
+    закрыть соединение и помогает заметить отключившихся.
+    """
+    disconnected = asyncio.ensure_future(wait_disconnect(receive))
+    async with get_broker().subscribe(comments_channel(news_id)) as queue:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream; charset=utf-8'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        await send({
+            'type': 'http.response.body', 'body': b'', 'more_body': True
+        })
+        try:
+            while not disconnected.done():
+                message = asyncio.ensure_future(queue.get())
+                await asyncio.wait(
+                    (message, disconnected),
+                    timeout=heartbeat,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if message.done():
+                    body = format_event(message.result())
+                else:
+                    message.cancel()
+                    body = b': ping\n\n'
+                if not disconnected.done():
+                    await send({
+                        'type': 'http.response.body',
+                        'body': body,
+                        'more_body': True,
+                    })
+        finally:
+            disconnected.cancel()
+
+
+async def not_found(send):
+    await send({
+        'type': 'http.response.start',
+        'status': 404,
+        'headers': [(b'content-type', b'text/plain; charset=utf-8')],
+    })
+    await send({
+        'type': 'http.response.body', 'body': 'Новость не найдена.'.encode()
+    })
+
+
+async def comment_events(scope, receive, send):
+    """ASGI-приложение ленты новых комментариев /news/<pk>/events/."""
+    news_id = int(EVENTS_PATH.match(scope['path'])['pk'])
+    exists = await sync_to_async(News.objects.filter(pk=news_id).exists)()
+    if not exists:
+        return await not_found(send)
+    await stream_comments(
+        news_id, send, receive, settings.NEWS_EVENTS_HEARTBEAT
+    )
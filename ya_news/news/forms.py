@@ -1,7 +1,10 @@
+from django import forms
+from django.contrib.auth import get_user_model
 from django.forms import ModelForm
 from django.core.exceptions import ValidationError
 
-from .models import Comment
+from .models import Comment, News
+from .profanity import BadWordsMatcher
 
 BAD_WORDS = (
     'редиска',
@@ -10,6 +13,15 @@ BAD_WORDS = (
 )
 WARNING = 'Не ругайтесь!'
 
+bad_words_matcher = BadWordsMatcher(BAD_WORDS)
+
+DELETE = 'delete'
+FLAG = 'flag'
+MODERATION_ACTIONS = (
+    (DELETE, 'Удалить'),
+    (FLAG, 'Пометить'),
+)
+
 
 class CommentForm(ModelForm):
 
@@ -20,8 +32,25 @@ class CommentForm(ModelForm):
     def clean_text(self):
         """Не позволяем ругаться в комментариях."""
         text = self.cleaned_data['text']
-        lowered_text = text.lower()
-        for word in BAD_WORDS:
-            if word in lowered_text:
-                raise ValidationError(WARNING)
+        if bad_words_matcher.search(text):
+            raise ValidationError(WARNING)
         return text
+
+
+class ModerationForm(forms.Form):
+    """Какие комментарии проверить и что сделать с нарушителями."""
+    news = forms.ModelChoiceField(News.objects.all(), required=False)
+    author = forms.ModelChoiceField(
+        get_user_model().objects.all(), required=False
+    )
+    action = forms.ChoiceField(choices=MODERATION_ACTIONS, initial=DELETE)
+
+    def get_queryset(self):
+        """Комментарии, попадающие под условия формы."""
+        comments = Comment.objects.all()
+        for field in ('news', 'author'):
+            if self.cleaned_data[field] is not None:
+                comments = comments.filter(**{
+                    field: self.cleaned_data[field]
+                })
+        return comments
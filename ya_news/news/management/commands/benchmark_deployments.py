@@ -0,0 +1,210 @@
+import asyncio
+import socket
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from socketserver import ThreadingMixIn
+from urllib.parse import urlsplit
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+
+WSGI, ASGI = 'wsgi', 'asgi'
+# Синхронные и асинхронные версии одних и тех же страниц.
+PATHS = {
+    WSGI: ('/', '/news/{pk}/'),
+    ASGI: ('/async/', '/async/news/{pk}/'),
+}
+HOST = '127.0.0.1'
+
+
+class Report(
+        namedtuple('Report', ('count', 'errors', 'seconds', 'latencies'))
+):
+    """Итоги нагрузки на одну страницу."""
+
+    @property
+    def per_second(self):
+        return round(self.count / self.seconds) if self.seconds else 0
+
+    def percentile(self, percent):
+        """Задержка в миллисекундах, которую не превысили percent запросов."""
+        if not self.latencies:
+            return 0
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, len(ordered) * percent // 100)
+        return ordered[index] * 1000
+
+    def __str__(self):
+        return (
+            f'{self.per_second} запросов/с, '
+            f'p50 {self.percentile(50):.1f} мс, '
+            f'p95 {self.percentile(95):.1f} мс, '
+            f'p99 {self.percentile(99):.1f} мс, '
+            f'ошибок: {self.errors}'
+        )
+
+
+async def fetch(url, client_delay):
+    """
+    Один запрос медленного клиента: заголовки уходят в два приёма.
+
+    Пока клиент досылает запрос, синхронный сервер держит
+    на нём поток, а асинхронный обслуживает других.
+    """
+    parts = urlsplit(url)
+    start = time.perf_counter()
+    reader, writer = await asyncio.open_connection(parts.hostname, parts.port)
+    try:
+        writer.write(f'GET {parts.path} HTTP/1.1\r\n'.encode())
+        await writer.drain()
+        if client_delay:
+            await asyncio.sleep(client_delay)
+        writer.write(
+            f'Host: {parts.netloc}\r\nConnection: close\r\n\r\n'.encode()
+        )
+        await writer.drain()
+        status = int((await reader.readline()).split()[1])
+        await reader.read()
+    finally:
+        writer.close()
+    return status, time.perf_counter() - start
+
+
+async def load(url, requests, concurrency, client_delay=0):
+    """Отправляет requests запросов, не больше concurrency одновременно."""
+    latencies = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            try:
+                status, latency = await fetch(url, client_delay)
+            except (OSError, ValueError, IndexError):
+                errors += 1
+                continue
+            if status != 200:
+                errors += 1
+            latencies.append(latency)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return Report(
+        requests, errors, time.perf_counter() - start, latencies
+    )
+
+
+class QuietHandler(WSGIRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+
+class PooledWSGIServer(ThreadingMixIn, WSGIServer):
+    """WSGI-сервер с ограниченным пулом потоков, как у gunicorn --threads."""
+
+    def __init__(self, *args, threads, **kwargs):
+        self.pool = ThreadPoolExecutor(threads)
+        super().__init__(*args, **kwargs)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(
+            self.process_request_thread, request, client_address
+        )
+
+
+def free_socket():
+    sock = socket.socket()
+    sock.bind((HOST, 0))
+    return sock
+
+
+def serve_wsgi(threads):
+    server = PooledWSGIServer(
+        (HOST, 0), QuietHandler, threads=threads
+    )
+    server.set_app(get_wsgi_application())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://{HOST}:{server.server_port}', server.shutdown
+
+
+def serve_asgi():
+    try:
+        import uvicorn
+    except ImportError:
+        raise CommandError(
+            'Для локального ASGI-сервера нужен uvicorn '
+            '(pip install uvicorn) или адрес сервера в --asgi-url.'
+        )
+    from yanews.asgi import application
+
+    sock = free_socket()
+    server = uvicorn.Server(
+        uvicorn.Config(application, log_level='warning', lifespan='off')
+    )
+    threading.Thread(
+        target=server.run, kwargs={'sockets': [sock]}, daemon=True
+    ).start()
+    while not server.started:
+        time.sleep(0.05)
+
+    def stop():
+        server.should_exit = True
+
+    return f'http://{HOST}:{sock.getsockname()[1]}', stop
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает производительность главной страницы и страницы '
+        'новости при развёртывании через WSGI и через ASGI.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--deployments', nargs='+', choices=(WSGI, ASGI),
+            default=(WSGI, ASGI),
+        )
+        parser.add_argument('--wsgi-url', help='Адрес запущенного WSGI.')
+        parser.add_argument('--asgi-url', help='Адрес запущенного ASGI.')
+        parser.add_argument('--news', type=int, default=1, help='Id новости.')
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument(
+            '--client-delay', type=float, default=0,
+            help='Сколько секунд клиент досылает запрос.',
+        )
+        parser.add_argument(
+            '--wsgi-threads', type=int, default=8,
+            help='Потоков у локального WSGI-сервера.',
+        )
+
+    def handle(self, *args, **options):
+        for deployment in options['deployments']:
+            base_url = options[f'{deployment}_url']
+            stop = None
+            if base_url is None:
+                base_url, stop = (
+                    serve_wsgi(options['wsgi_threads'])
+                    if deployment == WSGI else serve_asgi()
+                )
+            try:
+                for path in PATHS[deployment]:
+                    path = path.format(pk=options['news'])
+                    url = base_url.rstrip('/') + path
+                    report = asyncio.run(load(
+                        url,
+                        options['requests'],
+                        options['concurrency'],
+                        options['client_delay'],
+                    ))
+                    self.stdout.write(
+                        f'{deployment.upper()} {path}: {report}'
+                    )
+            finally:
+                if stop is not None:
+                    stop()
@@ -0,0 +1,117 @@
+import shutil
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from copy import deepcopy
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+
+from news.models import Comment, News
+
+SQLITE = 'django.db.backends.sqlite3'
+TUNED_SQLITE = 'yanews.db_backends.sqlite3'
+
+
+class WriteReport(
+        namedtuple('WriteReport', ('writes', 'errors', 'seconds'))
+):
+    """Итоги параллельной записи комментариев."""
+
+    @property
+    def per_second(self):
+        return round(self.writes / self.seconds) if self.seconds else 0
+
+    def __str__(self):
+        return (
+            f'записей: {self.writes}, '
+            f'«database is locked»: {self.errors}, '
+            f'скорость: {self.per_second} в секунду'
+        )
+
+
+def profiles(directory):
+    """Настройки SQLite по умолчанию и проекта, каждые в своём файле."""
+    tuned = deepcopy(settings.DATABASES['default'])
+    if tuned['ENGINE'] != TUNED_SQLITE:
+        raise CommandError(
+            'Сравнение проводится для SQLite с настройками проекта.'
+        )
+    tuned['NAME'] = str(Path(directory) / 'tuned.sqlite3')
+    default = {
+        'ENGINE': SQLITE,
+        'NAME': str(Path(directory) / 'default.sqlite3'),
+    }
+    return {'bench_default': default, 'bench_tuned': tuned}
+
+
+def write_comments(alias, news, author, count, errors):
+    """Транзакции «прочитать, затем записать», как при отправке комментария."""
+    try:
+        for _ in range(count):
+            try:
+                with transaction.atomic(using=alias):
+                    Comment.objects.using(alias).filter(news=news).exists()
+                    Comment.objects.using(alias).create(
+                        news=news, author=author, text='Комментарий'
+                    )
+            except OperationalError:
+                errors.append(1)
+    finally:
+        connections[alias].close()
+
+
+def run(alias, writers, count):
+    call_command('migrate', database=alias, verbosity=0)
+    news = News.objects.using(alias).create(title='Новость', text='Текст')
+    author = get_user_model().objects.using(alias).create(username='Автор')
+    connections[alias].close()
+    errors = []
+    threads = [
+        threading.Thread(
+            target=write_comments, args=(alias, news, author, count, errors)
+        )
+        for _ in range(writers)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+    writes = Comment.objects.using(alias).count()
+    connections[alias].close()
+    return WriteReport(writes, len(errors), seconds)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает параллельную запись комментариев в SQLite '
+        'с настройками по умолчанию и с настройками проекта.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8)
+        parser.add_argument(
+            '--writes', type=int, default=100,
+            help='Сколько комментариев пишет каждый поток.',
+        )
+
+    def handle(self, *args, **options):
+        directory = tempfile.mkdtemp()
+        aliases = profiles(directory)
+        connections.settings.update(aliases)
+        try:
+            for alias in aliases:
+                report = run(alias, options['writers'], options['writes'])
+                self.stdout.write(f'{alias}: {report}')
+        finally:
+            for alias in aliases:
+                connections[alias].close()
+                del connections.settings[alias]
+            shutil.rmtree(directory)
@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from news.transfer import FORMATS, MODELS, export_rows, guess_format
+
+CHUNK_SIZE = 2000
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает новости или комментарии в JSON Lines или CSV, '
+        'читая базу курсором: память не зависит от числа строк.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=MODELS)
+        parser.add_argument('path', help='Файл или «-» для stdout.')
+        parser.add_argument('--format', choices=FORMATS)
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        model, columns = MODELS[options['model']]
+        path = options['path']
+        file_format = options['format'] or guess_format(path)
+        started = time.perf_counter()
+        if path == '-':
+            count = export_rows(
+                model.objects.all(), columns, self.stdout, file_format,
+                options['chunk_size'],
+            )
+        else:
+            with open(path, 'w', encoding='utf-8', newline='') as stream:
+                count = export_rows(
+                    model.objects.all(), columns, stream, file_format,
+                    options['chunk_size'],
+                )
+        elapsed = time.perf_counter() - started
+        self.stderr.write(
+            f'Выгружено строк: {count} за {elapsed:.1f} с '
+            f'({count / max(elapsed, 1e-9):.0f} строк/с).'
+        )
@@ -0,0 +1,45 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from news.transfer import FORMATS, MODELS, guess_format, import_rows, read_rows
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает новости или комментарии из JSON Lines или CSV. '
+        'Файл читается построчно, строки вставляются пачками '
+        'в отдельных транзакциях; новости загружаются раньше '
+        'комментариев к ним.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=MODELS)
+        parser.add_argument('path', help='Файл или «-» для stdin.')
+        parser.add_argument('--format', choices=FORMATS)
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        model, columns = MODELS[options['model']]
+        path = options['path']
+        file_format = options['format'] or guess_format(path)
+        started = time.perf_counter()
+        if path == '-':
+            count = import_rows(
+                model, columns, read_rows(sys.stdin, file_format),
+                options['batch_size'],
+            )
+        else:
+            with open(path, encoding='utf-8', newline='') as stream:
+                count = import_rows(
+                    model, columns, read_rows(stream, file_format),
+                    options['batch_size'],
+                )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'Загружено строк: {count} за {elapsed:.1f} с '
+            f'({count / max(elapsed, 1e-9):.0f} строк/с).'
+        )
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from news.cache import bump_news_versions
+from news.models import News
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает число комментариев и время последнего '
+        'комментария у новостей пачками по первичному ключу.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        news_ids = News.objects.order_by('pk').values_list('pk', flat=True)
+        last_pk = 0
+        total = 0
+        while True:
+            batch = list(
+                news_ids.filter(pk__gt=last_pk)[:options['batch_size']]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1]
+            # UPDATE не вызывает сигналов: закэшированные блоки
+            # и страницы новостей пачки сбрасываются вручную.
+            with transaction.atomic():
+                total += News.objects.filter(
+                    pk__in=batch
+                ).refresh_comment_counters()
+                bump_news_versions(batch)
+        self.stdout.write(f'Пересчитано новостей: {total}.')
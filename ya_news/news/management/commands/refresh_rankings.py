@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from news.rankings import refresh_rankings
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает самые обсуждаемые новости за сутки и неделю; '
+        'запускается периодически, например из cron.'
+    )
+
+    def handle(self, *args, **options):
+        for period, size in refresh_rankings().items():
+            self.stdout.write(f'{period}: мест в рейтинге {size}.')
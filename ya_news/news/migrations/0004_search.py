@@ -0,0 +1,89 @@
+from django.db import migrations
+
+
+def normalized(column):
+    """Буква «ё» индексируется как «е», иначе «еж» не найдёт «ёж»."""
+    return f"replace(replace({column}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+def fts_sql(table, columns):
+    """Таблица FTS5 над table и триггеры, поддерживающие её в актуальном виде."""
+    fts = f'{table}_fts'
+    names = ', '.join(columns)
+
+    def values(prefix):
+        return ', '.join(normalized(f'{prefix}{column}') for column in columns)
+
+    return (
+        f"""
+        CREATE VIRTUAL TABLE {fts} USING fts5(
+            {names},
+            content='{table}', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+        """,
+        f"""
+        CREATE TRIGGER {fts}_insert AFTER INSERT ON {table} BEGIN
+            INSERT INTO {fts}(rowid, {names})
+            VALUES (new.id, {values('new.')});
+        END
+        """,
+        f"""
+        CREATE TRIGGER {fts}_delete AFTER DELETE ON {table} BEGIN
+            INSERT INTO {fts}({fts}, rowid, {names})
+            VALUES ('delete', old.id, {values('old.')});
+        END
+        """,
+        f"""
+        CREATE TRIGGER {fts}_update AFTER UPDATE OF {names} ON {table} BEGIN
+            INSERT INTO {fts}({fts}, rowid, {names})
+            VALUES ('delete', old.id, {values('old.')});
+            INSERT INTO {fts}(rowid, {names})
+            VALUES (new.id, {values('new.')});
+        END
+        """,
+        f"""
+        INSERT INTO {fts}(rowid, {names})
+        SELECT id, {values('')} FROM {table}
+        """,
+    )
+
+
+def drop_fts_sql(table):
+    fts = f'{table}_fts'
+    return (
+        f'DROP TRIGGER {fts}_update',
+        f'DROP TRIGGER {fts}_delete',
+        f'DROP TRIGGER {fts}_insert',
+        f'DROP TABLE {fts}',
+    )
+
+
+FORWARD_SQL = (
+    fts_sql('news_news', ('title', 'text'))
+    + fts_sql('news_comment', ('text',))
+)
+BACKWARD_SQL = drop_fts_sql('news_comment') + drop_fts_sql('news_news')
+
+
+def run_sqlite(statements):
+    """Полнотекстовый индекс есть только у SQLite (FTS5)."""
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0003_comment_flagged'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_sqlite(FORWARD_SQL), run_sqlite(BACKWARD_SQL)
+        ),
+    ]
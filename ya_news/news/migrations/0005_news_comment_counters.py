@@ -0,0 +1,98 @@
+# Generated by Django 3.2.15 on 2026-10-18 16:55
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def normalized(column):
+    """Буква «ё» индексируется как «е», как и в 0004_search."""
+    return f"replace(replace({column}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+# SQLite добавляет поля, пересоздавая таблицу news_news, и вместе
+# со старой таблицей удаляет триггеры полнотекстового индекса.
+TRIGGERS_SQL = (
+    'DROP TRIGGER IF EXISTS news_news_fts_update',
+    'DROP TRIGGER IF EXISTS news_news_fts_delete',
+    'DROP TRIGGER IF EXISTS news_news_fts_insert',
+    f"""
+    CREATE TRIGGER news_news_fts_insert AFTER INSERT ON news_news BEGIN
+        INSERT INTO news_news_fts(rowid, title, text)
+        VALUES (new.id, {normalized('new.title')}, {normalized('new.text')});
+    END
+    """,
+    f"""
+    CREATE TRIGGER news_news_fts_delete AFTER DELETE ON news_news BEGIN
+        INSERT INTO news_news_fts(news_news_fts, rowid, title, text)
+        VALUES (
+            'delete', old.id, {normalized('old.title')}, {normalized('old.text')}
+        );
+    END
+    """,
+    f"""
+    CREATE TRIGGER news_news_fts_update AFTER UPDATE OF title, text
+    ON news_news BEGIN
+        INSERT INTO news_news_fts(news_news_fts, rowid, title, text)
+        VALUES (
+            'delete', old.id, {normalized('old.title')}, {normalized('old.text')}
+        );
+        INSERT INTO news_news_fts(rowid, title, text)
+        VALUES (new.id, {normalized('new.title')}, {normalized('new.text')});
+    END
+    """,
+)
+
+
+def restore_triggers(apps, schema_editor):
+    """Полнотекстовый индекс есть только у SQLite (FTS5)."""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in TRIGGERS_SQL:
+        schema_editor.execute(statement)
+
+
+def count_comments(apps, schema_editor):
+    News = apps.get_model('news', 'News')
+    Comment = apps.get_model('news', 'Comment')
+    comments = Comment.objects.filter(news=OuterRef('pk')).order_by()
+    News.objects.update(
+        comment_count=Coalesce(
+            Subquery(
+                comments.values('news').annotate(
+                    count=Count('pk')
+                ).values('count')
+            ),
+            0,
+        ),
+        last_comment_at=Subquery(
+            comments.order_by('-created').values('created')[:1]
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0004_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, restore_triggers),
+        migrations.AddField(
+            model_name='news',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Комментариев'),
+        ),
+        migrations.AddField(
+            model_name='news',
+            name='last_comment_at',
+            field=models.DateTimeField(editable=False, null=True, verbose_name='Последний комментарий'),
+        ),
+        migrations.AddIndex(
+            model_name='news',
+            index=models.Index(fields=['-last_comment_at'], name='news_last_comment_idx'),
+        ),
+        migrations.RunPython(restore_triggers, migrations.RunPython.noop),
+        migrations.RunPython(count_comments, migrations.RunPython.noop),
+    ]
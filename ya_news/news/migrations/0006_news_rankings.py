@@ -0,0 +1,36 @@
+# Generated by Django 3.2.15 on 2026-10-18 16:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0005_news_comment_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NewsRanking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('day', 'За сутки'), ('week', 'За неделю')], max_length=10)),
+                ('position', models.PositiveIntegerField()),
+                ('comments', models.PositiveIntegerField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['created', 'news'], name='comment_created_idx'),
+        ),
+        migrations.AddField(
+            model_name='newsranking',
+            name='news',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='news.news'),
+        ),
+        migrations.AddConstraint(
+            model_name='newsranking',
+            constraint=models.UniqueConstraint(fields=('period', 'position'), name='news_ranking_position'),
+        ),
+    ]
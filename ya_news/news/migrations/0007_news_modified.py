@@ -0,0 +1,67 @@
+# Generated by Django 3.2.15 on 2026-10-18 17:47
+
+from django.db import migrations, models
+
+
+def normalized(column):
+    """Буква «ё» индексируется как «е», как и в 0004_search."""
+    return f"replace(replace({column}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+# SQLite добавляет поле, пересоздавая таблицу news_news, и вместе
+# со старой таблицей удаляет триггеры полнотекстового индекса.
+TRIGGERS_SQL = (
+    'DROP TRIGGER IF EXISTS news_news_fts_update',
+    'DROP TRIGGER IF EXISTS news_news_fts_delete',
+    'DROP TRIGGER IF EXISTS news_news_fts_insert',
+    f"""
+    CREATE TRIGGER news_news_fts_insert AFTER INSERT ON news_news BEGIN
+        INSERT INTO news_news_fts(rowid, title, text)
+        VALUES (new.id, {normalized('new.title')}, {normalized('new.text')});
+    END
+    """,
+    f"""
+    CREATE TRIGGER news_news_fts_delete AFTER DELETE ON news_news BEGIN
+        INSERT INTO news_news_fts(news_news_fts, rowid, title, text)
+        VALUES (
+            'delete', old.id, {normalized('old.title')}, {normalized('old.text')}
+        );
+    END
+    """,
+    f"""
+    CREATE TRIGGER news_news_fts_update AFTER UPDATE OF title, text
+    ON news_news BEGIN
+        INSERT INTO news_news_fts(news_news_fts, rowid, title, text)
+        VALUES (
+            'delete', old.id, {normalized('old.title')}, {normalized('old.text')}
+        );
+        INSERT INTO news_news_fts(rowid, title, text)
+        VALUES (new.id, {normalized('new.title')}, {normalized('new.text')});
+    END
+    """,
+)
+
+
+def restore_triggers(apps, schema_editor):
+    """Полнотекстовый индекс есть только у SQLite (FTS5)."""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in TRIGGERS_SQL:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0006_news_rankings'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, restore_triggers),
+        migrations.AddField(
+            model_name='news',
+            name='modified',
+            field=models.DateTimeField(auto_now=True, verbose_name='Изменена'),
+        ),
+        migrations.RunPython(restore_triggers, migrations.RunPython.noop),
+    ]
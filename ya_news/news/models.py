@@ -1,16 +1,70 @@
 from datetime import datetime
 
 from django.conf import settings
-from django.db import models
+from django.db import models, router, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+
+def news_comments():
+    return Comment.objects.filter(news=OuterRef('pk')).order_by()
+
+
+def last_comment_at():
+    """Время последнего комментария к новости — одно чтение индекса."""
+    return Subquery(
+        news_comments().order_by('-created').values('created')[:1]
+    )
+
+
+class NewsQuerySet(models.QuerySet):
+
+    def refresh_comment_counters(self):
+        """
+        Пересчитывает счётчики комментариев одним UPDATE.
+
+        Нужен после массовых операций с комментариями, которые
+        обходят Comment.save() и Comment.delete().
+        """
+        return self.update(
+            comment_count=Coalesce(
+                Subquery(
+                    news_comments().values('news').annotate(
+                        count=Count('pk')
+                    ).values('count')
+                ),
+                0,
+            ),
+            last_comment_at=last_comment_at(),
+            modified=timezone.now(),
+        )
 
 
 class News(models.Model):
     title = models.CharField(max_length=50)
     text = models.TextField()
     date = models.DateField(default=datetime.today)
+    comment_count = models.PositiveIntegerField(
+        'Комментариев', default=0, editable=False
+    )
+    last_comment_at = models.DateTimeField(
+        'Последний комментарий', null=True, editable=False
+    )
+    # Меняется при любом изменении новости или её комментариев;
+    # по нему API отвечает 304 без чтения комментариев.
+    modified = models.DateTimeField('Изменена', auto_now=True)
+
+    objects = NewsQuerySet.as_manager()
 
     class Meta:
         ordering = ('-date',)
+        indexes = (
+            models.Index(fields=('-date',), name='news_date_idx'),
+            models.Index(
+                fields=('-last_comment_at',), name='news_last_comment_idx'
+            ),
+        )
         verbose_name_plural = 'Новости'
         verbose_name = 'Новость'
 
@@ -21,17 +75,98 @@ class News(models.Model):
 class Comment(models.Model):
     news = models.ForeignKey(
         News,
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        db_index=False,
     )
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
+        db_index=False,
     )
     text = models.TextField()
     created = models.DateTimeField(auto_now_add=True)
+    flagged = models.BooleanField(default=False)
 
     class Meta:
         ordering = ('created',)
+        indexes = (
+            models.Index(
+                fields=('news', 'created', 'id'),
+                name='comment_news_created_idx',
+            ),
+            models.Index(fields=('author', 'id'), name='comment_author_idx'),
+            # Комментарии за период читаются диапазоном по времени,
+            # а id новости берётся прямо из индекса.
+            models.Index(
+                fields=('created', 'news'), name='comment_created_idx'
+            ),
+        )
 
     def __str__(self):
         return self.text[:50]
+
+    def save(self, *args, **kwargs):
+        """
+        Новый комментарий сразу учитывается в счётчиках новости,
+        любое изменение комментария — во времени изменения новости.
+        """
+        using = kwargs.get('using') or router.db_for_write(
+            type(self), instance=self
+        )
+        news = News.objects.using(using).filter(pk=self.news_id)
+        with transaction.atomic(using=using):
+            if not self._state.adding:
+                super().save(*args, **kwargs)
+                news.update(modified=timezone.now())
+                return
+            super().save(*args, **kwargs)
+            created = Value(self.created, output_field=models.DateTimeField())
+            news.update(
+                comment_count=F('comment_count') + 1,
+                last_comment_at=Greatest(
+                    Coalesce('last_comment_at', created), created
+                ),
+                modified=timezone.now(),
+            )
+
+    def delete(self, *args, **kwargs):
+        using = kwargs.get('using') or self._state.db
+        with transaction.atomic(using=using):
+            result = super().delete(*args, **kwargs)
+            News.objects.using(using).filter(pk=self.news_id).update(
+                comment_count=Greatest(F('comment_count') - 1, 0),
+                last_comment_at=last_comment_at(),
+                modified=timezone.now(),
+            )
+        return result
+
+
+class NewsRanking(models.Model):
+    """
+    Самые обсуждаемые новости за период.
+
+    Таблица пересчитывается командой refresh_rankings, а страница
+    «Обсуждаемое» читает готовые места по индексу (period, position).
+    """
+    DAY = 'day'
+    WEEK = 'week'
+    PERIODS = (
+        (DAY, 'За сутки'),
+        (WEEK, 'За неделю'),
+    )
+
+    period = models.CharField(max_length=10, choices=PERIODS)
+    position = models.PositiveIntegerField()
+    news = models.ForeignKey(
+        News,
+        on_delete=models.CASCADE,
+        db_index=False,
+    )
+    comments = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('period', 'position'), name='news_ranking_position'
+            ),
+        )
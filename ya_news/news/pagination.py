@@ -0,0 +1,99 @@
+from datetime import date, datetime, timedelta, timezone
+
+from django.db.models import Q
+from django.http import Http404
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+# Целые за пределами BIGINT база не принимает: SQLite отвечает
+# на них OverflowError, а не пустой выборкой.
+MAX_INT = 2 ** 63 - 1
+
+
+def parse_int(value):
+    """Целое из запроса в пределах BIGINT, иначе ValueError."""
+    number = int(value)
+    if abs(number) > MAX_INT:
+        raise ValueError('Число вне диапазона.')
+    return number
+
+
+def format_cursor(created, pk):
+    return f'{(created - EPOCH) // MICROSECOND}-{pk}'
+
+
+def encode_cursor(comment):
+    """Курсор указывает на комментарий, после которого начнётся страница."""
+    return format_cursor(comment.created, comment.pk)
+
+
+def decode_cursor(cursor):
+    """Разбирает курсор; для испорченного курсора страницы нет."""
+    try:
+        created, pk = (parse_int(part) for part in cursor.split('-'))
+        return EPOCH + created * MICROSECOND, pk
+    except (ValueError, OverflowError):
+        raise Http404('Некорректный курсор.')
+
+
+def paginate_comments(queryset, cursor, page_size):
+    """
+    Возвращает страницу комментариев и курсор следующей страницы.
+
+    Страница выбирается по ключу (created, id), а не через OFFSET,
+    поэтому её стоимость не зависит от длины ветки.
+    """
+    queryset = queryset.order_by('created', 'id')
+    if cursor:
+        created, pk = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(created__gt=created) | Q(created=created, id__gt=pk)
+        )
+    comments = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(comments) > page_size:
+        comments = comments[:page_size]
+        next_cursor = encode_cursor(comments[-1])
+    return comments, next_cursor
+
+
+def encode_news_cursor(news):
+    """Курсор указывает на новость, после которой начнётся страница."""
+    return f'{news.date:%Y-%m-%d}.{news.pk}'
+
+
+def decode_news_cursor(cursor):
+    try:
+        day, pk = cursor.split('.')
+        return date.fromisoformat(day), parse_int(pk)
+    except ValueError:
+        raise Http404('Некорректный курсор.')
+
+
+def news_after(queryset, cursor):
+    """
+    Новости от новых к старым, начиная после курсора.
+
+    Внутри дня новости идут по возрастанию id: SQLite хранит id
+    последним столбцом индекса по дате, и такой порядок читается
+    из индекса без сортировки. Условие «после курсора» записано
+    диапазоном по дате, чтобы база начинала чтение индекса
+    с нужного места, а не перебирала его через OR.
+    """
+    queryset = queryset.order_by('-date', 'id')
+    if cursor:
+        day, pk = decode_news_cursor(cursor)
+        queryset = queryset.filter(date__lte=day).exclude(
+            date=day, id__lte=pk
+        )
+    return queryset
+
+
+def paginate_news(queryset, cursor, page_size):
+    """Страница новостей после курсора и курсор следующей."""
+    news_list = list(news_after(queryset, cursor)[:page_size + 1])
+    next_cursor = None
+    if len(news_list) > page_size:
+        news_list = news_list[:page_size]
+        next_cursor = encode_news_cursor(news_list[-1])
+    return news_list, next_cursor
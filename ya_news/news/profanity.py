@@ -0,0 +1,84 @@
+from collections import deque
+
+# Латинские буквы, которыми подменяют похожие кириллические.
+HOMOGLYPHS = str.maketrans({
+    'a': 'а', 'b': 'в', 'c': 'с', 'e': 'е', 'h': 'н', 'k': 'к', 'm': 'м',
+    'n': 'п', 'o': 'о', 'p': 'р', 'r': 'г', 't': 'т', 'u': 'и', 'x': 'х',
+    'y': 'у', 'ё': 'е',
+})
+
+
+def normalize(text):
+    """
+    Приводит текст к виду, в котором ищутся запрещённые слова.
+
+    Длина текста не меняется, поэтому позиции совпадений
+    в нормализованном и исходном тексте одни и те же.
+    """
+    return text.lower().translate(HOMOGLYPHS)
+
+
+class BadWordsMatcher:
+    """
+    Поиск запрещённых слов автоматом Ахо — Корасик.
+
+    Автомат строится один раз по всему словарю, после чего любой текст
+    проверяется за один проход независимо от числа слов в словаре.
+    При whole_words=True совпадение засчитывается, только если слово
+    не является частью другого слова.
+    """
+
+    def __init__(self, words, whole_words=False):
+        self.whole_words = whole_words
+        self.load(words)
+
+    def load(self, words):
+        """Перестраивает автомат; подходит для перезагрузки словаря."""
+        transitions = [{}]
+        outputs = [()]
+        for word in {normalize(word) for word in words if word}:
+            state = 0
+            for char in word:
+                if char not in transitions[state]:
+                    transitions.append({})
+                    outputs.append(())
+                    transitions[state][char] = len(transitions) - 1
+                state = transitions[state][char]
+            outputs[state] += (word,)
+        fail = [0] * len(transitions)
+        queue = deque(transitions[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in transitions[state].items():
+                queue.append(next_state)
+                fallback = fail[state]
+                while fallback and char not in transitions[fallback]:
+                    fallback = fail[fallback]
+                fail[next_state] = transitions[fallback].get(char, 0)
+                outputs[next_state] += outputs[fail[next_state]]
+        # Подменяем автомат целиком, чтобы параллельные проверки
+        # не увидели его наполовину построенным.
+        self._automaton = (transitions, fail, outputs)
+
+    def search(self, text):
+        """Возвращает первое найденное запрещённое слово или None."""
+        transitions, fail, outputs = self._automaton
+        text = normalize(text)
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in transitions[state]:
+                state = fail[state]
+            state = transitions[state].get(char, 0)
+            for word in outputs[state]:
+                if not self.whole_words or self._is_whole_word(
+                    text, position - len(word) + 1, position + 1
+                ):
+                    return word
+        return None
+
+    @staticmethod
+    def _is_whole_word(text, start, end):
+        return (
+            (start == 0 or not text[start - 1].isalnum())
+            and (end == len(text) or not text[end].isalnum())
+        )
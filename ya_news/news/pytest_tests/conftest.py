@@ -1,14 +1,101 @@
+import asyncio
+
 import pytest
 from datetime import timedelta
 from django.utils import timezone
 
 from django.conf import settings
+from django.core.management import call_command
+from django.db import connections
 from django.urls import reverse
 from django.test.client import Client
 
+from news.broker import get_broker
+from news.cache import get_cache
+from news.events import comment_events
 from news.models import Comment, News
 from news.forms import BAD_WORDS
 
+COMMENTS_PER_NEWS = 50
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Откат транзакции теста не сбрасывает кэш — чистим его сами."""
+    get_cache().clear()
+
+
+class EventStream:
+    """Соединение с лентой комментариев так, как его ведёт ASGI-сервер."""
+
+    def __init__(self, news_id):
+        self.scope = {
+            'type': 'http',
+            'method': 'GET',
+            'path': f'/news/{news_id}/events/',
+            'headers': [],
+        }
+        self.messages = []
+        self.started = asyncio.Event()
+        self.received = asyncio.Event()
+        self.closed = asyncio.Event()
+        self.task = None
+
+    def open(self):
+        self.task = asyncio.ensure_future(
+            comment_events(self.scope, self.receive, self.send)
+        )
+        return self
+
+    async def receive(self):
+        await self.closed.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(self, message):
+        self.messages.append(message)
+        self.started.set()
+        if message.get('body'):
+            self.received.set()
+
+    async def close(self):
+        self.closed.set()
+        await self.task
+
+    @property
+    def status(self):
+        return self.messages[0]['status']
+
+    @property
+    def body(self):
+        return b''.join(
+            message.get('body', b'') for message in self.messages[1:]
+        ).decode()
+
+
+@pytest.fixture
+def event_stream():
+    """Класс соединения с лентой; брокер у каждого теста свой."""
+    get_broker.cache_clear()
+    yield EventStream
+    get_broker.cache_clear()
+
+
+@pytest.fixture
+def replica(settings, tmp_path):
+    """Реплика в отдельном файле SQLite — копия основной базы."""
+    alias = 'replica1'
+    primary = connections.settings['default']
+    connections.settings[alias] = {
+        'ENGINE': primary['ENGINE'],
+        'NAME': str(tmp_path / 'replica.sqlite3'),
+        'OPTIONS': primary['OPTIONS'],
+    }
+    settings.DATABASE_REPLICAS = [alias]
+    call_command('sync_replicas', verbosity=0)
+    yield alias
+    connections[alias].close()
+    del connections.settings[alias]
+
 
 @pytest.fixture
 def author(django_user_model):
@@ -65,6 +152,36 @@ def comment(news, author):
     )
 
 
+@pytest.fixture
+def many_comments(all_news_list, author):
+    comments = [
+        Comment(news=news, author=author, text=f'Комментарий {index}')
+        for news in News.objects.all()
+        for index in range(COMMENTS_PER_NEWS)
+    ]
+    Comment.objects.bulk_create(comments)
+    News.objects.refresh_comment_counters()
+    return COMMENTS_PER_NEWS
+
+
+@pytest.fixture
+def bad_comment(news, not_author):
+    return Comment.objects.create(
+        news=news,
+        author=not_author,
+        text=f'Ты {BAD_WORDS[0]}!',
+    )
+
+
+@pytest.fixture
+def long_thread(news, author):
+    Comment.objects.bulk_create(
+        Comment(news=news, author=author, text=f'Комментарий {index}')
+        for index in range(COMMENTS_PER_NEWS)
+    )
+    return COMMENTS_PER_NEWS
+
+
 @pytest.fixture
 def get_url_news_home():
     return reverse('news:home')
@@ -75,6 +192,21 @@ def get_url_news_detail(news):
     return reverse('news:detail', args=(news.id,))
 
 
+@pytest.fixture
+def get_url_news_comments(news):
+    return reverse('news:comments', args=(news.id,))
+
+
+@pytest.fixture
+def get_url_api_list():
+    return reverse('news:api_list')
+
+
+@pytest.fixture
+def get_url_api_detail(news):
+    return reverse('news:api_detail', args=(news.id,))
+
+
 @pytest.fixture
 def get_url_comment_edit(comment):
     return reverse('news:edit', args=(comment.id,))
@@ -85,6 +217,21 @@ def get_url_comment_delete(comment):
     return reverse('news:delete', args=(comment.id,))
 
 
+@pytest.fixture
+def get_url_moderate():
+    return reverse('news:moderate')
+
+
+@pytest.fixture
+def get_url_search():
+    return reverse('news:search')
+
+
+@pytest.fixture
+def get_url_archive():
+    return reverse('news:archive')
+
+
 @pytest.fixture
 def bad_words_fixture():
     return {'text': f'Текст раз, {BAD_WORDS[0]}, и дальше'}
@@ -1,5 +1,14 @@
 import pytest
+from datetime import timedelta
+from http import HTTPStatus
+
 from django.conf import settings
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from news.cache import get_cache
+from news.models import Comment, News
 
 pytestmark = pytest.mark.django_db
 
@@ -21,6 +30,75 @@ def test_news_order(all_news_list, get_url_news_home, client):
     assert all_dates == sorted_dates
 
 
+def test_home_page_does_not_load_comments(
+        many_comments, get_url_news_home, client, django_assert_num_queries
+):
+    """
+    Главная страница собирается одним запросом,
+    сколько бы комментариев ни было у новостей.
+    """
+    with django_assert_num_queries(1):
+        response = client.get(get_url_news_home)
+    for news in response.context['object_list']:
+        assert news.comment_count == many_comments
+        assert not hasattr(news, '_prefetched_objects_cache')
+    assert f'Комментариев: {many_comments}' in response.content.decode()
+
+
+def test_home_page_served_from_cache(
+        all_news_list, get_url_news_home, client, django_assert_num_queries
+):
+    """Повторный показ главной страницы не обращается к базе."""
+    first_response = client.get(get_url_news_home)
+    with django_assert_num_queries(0):
+        response = client.get(get_url_news_home)
+    assert response.content == first_response.content
+
+
+def test_home_page_cache_invalidated_by_comment(
+        news, author, get_url_news_home, client,
+        django_capture_on_commit_callbacks, django_assert_num_queries
+):
+    """
+    Новый комментарий сбрасывает блок своей новости:
+    на главной сразу видно актуальное число комментариев.
+    """
+    client.get(get_url_news_home)
+    with django_capture_on_commit_callbacks(execute=True):
+        Comment.objects.create(news=news, author=author, text='Текст')
+    with django_assert_num_queries(1):
+        response = client.get(get_url_news_home)
+    assert 'Комментариев: 1' in response.content.decode()
+
+
+def test_home_page_cache_invalidated_by_news(
+        news, get_url_news_home, client, django_capture_on_commit_callbacks
+):
+    """Изменение и добавление новостей сразу видно на главной."""
+    client.get(get_url_news_home)
+    with django_capture_on_commit_callbacks(execute=True):
+        news.title = 'Новый заголовок'
+        news.save()
+        News.objects.create(title='Свежая новость', text='Текст')
+    content = client.get(get_url_news_home).content.decode()
+    assert 'Новый заголовок' in content
+    assert 'Свежая новость' in content
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize(
+    'name, async_name',
+    (('news:home', 'news:home_async'), ('news:detail', 'news:detail_async')),
+)
+def test_async_pages_match_sync(news, comment, client, name, async_name):
+    """Асинхронные версии страниц отдают то же, что синхронные."""
+    args = (news.pk,) if name == 'news:detail' else ()
+    response = client.get(reverse(name, args=args))
+    async_response = client.get(reverse(async_name, args=args))
+    assert async_response.status_code == HTTPStatus.OK
+    assert async_response.content == response.content
+
+
 def test_comments_order(all_news_list, get_url_news_detail, client):
     """
     Комментарии на странице отдельной новости отсортированы
@@ -35,6 +113,371 @@ def test_comments_order(all_news_list, get_url_news_detail, client):
     assert dates == dates_sorted
 
 
+def test_comments_paginated_by_cursor(
+        long_thread, get_url_news_detail, get_url_news_comments,
+        client, settings
+):
+    """
+    Комментарии выдаются страницами, «Показать ещё» продолжает
+    ветку с места остановки без пропусков и повторов.
+    """
+    settings.COMMENTS_PER_PAGE = 7
+    response = client.get(get_url_news_detail)
+    pages = [response.context['comments']]
+    next_cursor = response.context['next_cursor']
+    while next_cursor:
+        response = client.get(
+            get_url_news_comments, {'after': next_cursor}
+        )
+        pages.append(response.context['comments'])
+        next_cursor = response.context['next_cursor']
+    assert all(
+        len(page) <= settings.COMMENTS_PER_PAGE for page in pages
+    )
+    received = [comment.pk for page in pages for comment in page]
+    expected = list(
+        Comment.objects.order_by('created', 'id').values_list('pk', flat=True)
+    )
+    assert len(received) == long_thread
+    assert received == expected
+
+
+def test_more_comments_appended_in_place(
+        long_thread, get_url_news_detail, client, settings
+):
+    """
+    «Показать ещё» подгружает следующую страницу скриптом
+    в ветку на странице новости, а не открывает голый фрагмент.
+    """
+    settings.COMMENTS_PER_PAGE = 7
+    content = client.get(get_url_news_detail).content.decode()
+    assert 'class="more-comments"' in content
+    assert 'closest("a.more-comments")' in content
+
+
+@pytest.mark.parametrize(
+    'cursor', ('сломан', f'1-{2 ** 64}', f'{2 ** 62}-1', f'-{2 ** 62}-1')
+)
+def test_comments_page_with_broken_cursor(
+        get_url_news_comments, get_url_api_detail, client, cursor
+):
+    """
+    Испорченный курсор, в том числе с числами больше BIGINT,
+    приводит к ошибке 404 и на странице, и в API.
+    """
+    for url in (get_url_news_comments, get_url_api_detail):
+        response = client.get(url, {'after': cursor})
+        assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+def test_discussed_news_by_period(all_news_list, author, client):
+    """
+    Обсуждаемое за сутки и за неделю считает только комментарии
+    своего периода; больше комментариев — выше место.
+    """
+    fresh, old = News.objects.all()[:2]
+    Comment.objects.bulk_create(
+        [Comment(news=fresh, author=author, text='Сегодня')] * 3
+        + [Comment(news=old, author=author, text='Сегодня')] * 2
+        + [Comment(news=old, author=author, text='Давно')] * 5
+    )
+    Comment.objects.filter(text='Давно').update(
+        created=timezone.now() - timedelta(days=3)
+    )
+    call_command('refresh_rankings')
+    expected = {'day': [fresh.pk, old.pk], 'week': [old.pk, fresh.pk]}
+    for period, news_ids in expected.items():
+        response = client.get(reverse('news:discussed', args=(period,)))
+        rankings = response.context['rankings']
+        assert [ranking.news_id for ranking in rankings] == news_ids
+    assert [ranking.comments for ranking in rankings] == [7, 3]
+
+
+@pytest.mark.parametrize('after', ('сломан', str(2 ** 64)))
+def test_discussed_news_with_broken_cursor(client, after):
+    """Некорректный курсор рейтинга приводит к ошибке 404."""
+    response = client.get(
+        reverse('news:discussed', args=('day',)), {'after': after}
+    )
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+def test_discussed_news_paginated(many_comments, client, settings):
+    """Рейтинг выдаётся страницами без пропусков и повторов."""
+    settings.NEWS_PER_PAGE = 4
+    call_command('refresh_rankings')
+    url = reverse('news:discussed', args=('day',))
+    response = client.get(url)
+    received = list(response.context['rankings'])
+    while response.context['next_position']:
+        response = client.get(
+            url, {'after': response.context['next_position']}
+        )
+        received += response.context['rankings']
+    assert [ranking.position for ranking in received] == list(
+        range(1, News.objects.count() + 1)
+    )
+
+
+def test_archive_paginated_by_date(
+        all_news_list, get_url_archive, client, settings
+):
+    """
+    Архив показывает новости только за выбранные даты, от новых
+    к старым, и листается без пропусков даже внутри одного дня.
+    """
+    settings.NEWS_PER_PAGE = 3
+    today = timezone.now().date()
+    start, end = today - timedelta(days=8), today - timedelta(days=2)
+    News.objects.bulk_create(
+        News(title=f'Ещё {index}', text='Текст.', date=end)
+        for index in range(4)
+    )
+    params = {'start': start.isoformat(), 'end': end.isoformat()}
+    response = client.get(get_url_archive, params)
+    received = list(response.context['news_list'])
+    while response.context['next_cursor']:
+        response = client.get(
+            get_url_archive,
+            {**params, 'after': response.context['next_cursor']}
+        )
+        received += response.context['news_list']
+    expected = News.objects.filter(
+        date__range=(start, end)
+    ).order_by('-date', 'id')
+    assert [news.pk for news in received] == [news.pk for news in expected]
+    assert len(received) == 11
+
+
+@pytest.mark.parametrize(
+    'params',
+    (
+        {'start': '2024-13-01'},
+        {'end': 'вчера'},
+        {'after': 'сломан'},
+        {'after': f'2024-01-01.{2 ** 64}'},
+    )
+)
+def test_archive_with_broken_params(get_url_archive, client, params):
+    """Некорректная дата или курсор в архиве приводят к ошибке 404."""
+    response = client.get(get_url_archive, params)
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+def test_comment_thread_served_from_cache(
+        long_thread, get_url_news_detail, client, django_assert_num_queries
+):
+    """Повторный показ ветки комментариев читает из базы только новость."""
+    first_response = client.get(get_url_news_detail)
+    with django_assert_num_queries(1):
+        response = client.get(get_url_news_detail)
+    assert response.content == first_response.content
+
+
+def test_comment_page_cached_once_per_cursor(
+        long_thread, get_url_news_detail, get_url_news_comments, client,
+        django_assert_num_queries, settings
+):
+    """Записи одного курсора с пробелами и нулями берут страницу из кэша."""
+    settings.COMMENTS_PER_PAGE = 7
+    cursor = client.get(get_url_news_detail).context['next_cursor']
+    client.get(get_url_news_comments, {'after': cursor})
+    created, pk = cursor.split('-')
+    for variant in (f' {cursor}', f'0{created}-{pk}', f'{created}-0{pk} '):
+        with django_assert_num_queries(0):
+            response = client.get(get_url_news_comments, {'after': variant})
+        assert response.status_code == HTTPStatus.OK
+
+
+@pytest.mark.parametrize(
+    'parametrized_client, links_expected',
+    (
+        (pytest.lazy_fixture('author_client'), True),
+        (pytest.lazy_fixture('not_author_client'), False),
+    ),
+)
+def test_cached_thread_shows_links_to_author_only(
+        comment, client, parametrized_client, links_expected,
+        get_url_news_detail, get_url_comment_edit
+):
+    """
+    Ссылки на редактирование комментария из закэшированной ветки
+    видит только его автор.
+    """
+    client.get(get_url_news_detail)
+    response = parametrized_client.get(get_url_news_detail)
+    assert (get_url_comment_edit in response.content.decode()) is (
+        links_expected
+    )
+
+
+def test_cached_thread_invalidated_by_edit(
+        author_client, comment, get_url_news_detail, get_url_comment_edit,
+        form_data, django_capture_on_commit_callbacks
+):
+    """Отредактированный комментарий сразу виден на странице новости."""
+    author_client.get(get_url_news_detail)
+    with django_capture_on_commit_callbacks(execute=True):
+        author_client.post(get_url_comment_edit, data=form_data)
+    response = author_client.get(get_url_news_detail)
+    assert form_data['text'] in response.content.decode()
+    assert comment.text not in response.content.decode()
+
+
+def test_search_finds_news_and_comments(
+        news, author, get_url_search, client
+):
+    """
+    Поиск находит слово в заголовке новости и в комментарии
+    в любой форме; совпадение в заголовке выше.
+    """
+    news.title = 'Ёжик в тумане'
+    news.save()
+    Comment.objects.create(
+        news=news, author=author, text='<b>Ежики</b> — это мило'
+    )
+    response = client.get(get_url_search, {'q': 'ежиков'})
+    results = response.context['results']
+    assert [result.comment_id for result in results] == [
+        None, Comment.objects.get().pk
+    ]
+    assert '<mark>Ёжик</mark>' in results[0].snippet
+    assert '&lt;b&gt;<mark>Ежики</mark>&lt;/b&gt;' in results[1].snippet
+
+
+@pytest.mark.django_db(transaction=True)
+def test_search_reads_one_database(
+        news, replica, get_url_search, client
+):
+    """
+    Индекс и новости читаются из одной реплики: новость, которой
+    в реплике ещё нет, не находится и не роняет страницу.
+    """
+    News.objects.create(title='Ёжик в тумане', text='Текст')
+    response = client.get(get_url_search, {'q': 'ежик'})
+    assert response.status_code == HTTPStatus.OK
+    assert response.context['results'] == []
+
+
+def test_search_index_follows_deletion(
+        comment, get_url_search, client
+):
+    """Удалённый комментарий пропадает из поиска."""
+    comment.delete()
+    response = client.get(get_url_search, {'q': comment.text})
+    assert response.context['results'] == []
+
+
+@pytest.mark.parametrize(
+    'page', ('вторая', '0', str(2 ** 64), str(2 ** 63 // 10))
+)
+def test_search_with_broken_page(comment, get_url_search, client, page):
+    """
+    Номер страницы, которого не может быть, в том числе со смещением
+    больше BIGINT, приводит к ошибке 404.
+    """
+    response = client.get(get_url_search, {'q': comment.text, 'page': page})
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+def test_search_paginated(
+        long_thread, get_url_search, client, settings
+):
+    """Результаты поиска разбиты на страницы."""
+    settings.SEARCH_RESULTS_PER_PAGE = 30
+    received = []
+    page = 1
+    while page:
+        response = client.get(
+            get_url_search, {'q': 'комментарий', 'page': page}
+        )
+        received.extend(
+            result.comment_id for result in response.context['results']
+        )
+        page = response.context['next_page']
+    assert sorted(received) == sorted(
+        Comment.objects.values_list('id', flat=True)
+    )
+
+
+def test_api_news_list(many_comments, get_url_api_list, client):
+    """API отдаёт последние новости с числом комментариев."""
+    response = client.get(get_url_api_list)
+    news_list = response.json()['news']
+    assert len(news_list) == settings.NEWS_COUNT_ON_HOME_PAGE
+    assert all(news['comment_count'] == many_comments for news in news_list)
+
+
+@pytest.mark.parametrize(
+    'get_url',
+    (
+        pytest.lazy_fixture('get_url_api_list'),
+        pytest.lazy_fixture('get_url_api_detail'),
+    ),
+)
+@pytest.mark.parametrize('validator', ('ETag', 'Last-Modified'))
+def test_api_not_modified(
+        comment, get_url, validator, client, django_assert_num_queries
+):
+    """
+    Если данные не менялись, API отвечает 304, прочитав только
+    время изменения новостей, а не комментарии. Проверка не зависит
+    от кэша, который у каждого процесса может быть своим.
+    """
+    response = client.get(get_url)
+    header = {
+        'ETag': 'HTTP_IF_NONE_MATCH',
+        'Last-Modified': 'HTTP_IF_MODIFIED_SINCE',
+    }[validator]
+    get_cache().clear()
+    with django_assert_num_queries(1):
+        response = client.get(get_url, **{header: response[validator]})
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+
+
+@pytest.mark.parametrize(
+    'get_url',
+    (
+        pytest.lazy_fixture('get_url_api_list'),
+        pytest.lazy_fixture('get_url_api_detail'),
+    ),
+)
+def test_api_modified_by_new_comment(
+        news, author, get_url, client, django_capture_on_commit_callbacks
+):
+    """
+    Новый, изменённый и удалённый комментарий меняет ETag
+    и новости, и списка.
+    """
+    etag = client.get(get_url)['ETag']
+    with django_capture_on_commit_callbacks(execute=True):
+        comment = Comment.objects.create(
+            news=news, author=author, text='Новый'
+        )
+    for change in (
+        lambda: None,
+        lambda: Comment.objects.get(pk=comment.pk).save(),
+        lambda: Comment.objects.get(pk=comment.pk).delete(),
+    ):
+        change()
+        response = client.get(get_url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.OK
+        assert response['ETag'] != etag
+        etag = response['ETag']
+
+
+def test_api_news_detail(
+        long_thread, news, get_url_api_detail, client, settings
+):
+    """API новости отдаёт комментарии страницами по курсору."""
+    settings.COMMENTS_PER_PAGE = 10
+    data = client.get(get_url_api_detail).json()
+    assert data['title'] == news.title
+    assert len(data['comments']) == settings.COMMENTS_PER_PAGE
+    next_page = client.get(get_url_api_detail, {'after': data['next']})
+    assert next_page.json()['comments'][0]['id'] > data['comments'][-1]['id']
+
+
 @pytest.mark.parametrize(
     'parametrized_client, expected_status',
     (
@@ -1,12 +1,31 @@
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
 
 from http import HTTPStatus
 
+from asgiref.sync import sync_to_async
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
+from django.test import AsyncClient
+from django.urls import reverse
 from pytest_django.asserts import assertFormError, assertRedirects
 
+from news.cache import bump_version, get_versions, news_version_key
 from news.forms import WARNING
-from news.models import Comment
+from news.models import Comment, News
+from news.moderation import moderate_comments
+from news.profanity import BadWordsMatcher
+from news.views import NewsList
+from yanews.db_router import (
+    PRIMARY, PRIMARY_COOKIE, PrimaryAfterWriteMiddleware, ReplicaRouter,
+    primary
+)
 
 pytestmark = pytest.mark.django_db
 
@@ -33,6 +52,28 @@ def test_user_can_create_comment(not_author_client,
     assert comments_after == comments_before + 1
 
 
+@pytest.mark.django_db(transaction=True)
+def test_new_comment_pushed_to_subscribers(
+    event_stream, news, not_author_client, get_url_news_detail, form_data
+):
+    """Новый комментарий сразу приходит в открытую ленту новости."""
+    async def scenario():
+        stream = event_stream(news.pk).open()
+        await stream.started.wait()
+        await sync_to_async(not_author_client.post)(
+            get_url_news_detail, data=form_data
+        )
+        await asyncio.wait_for(stream.received.wait(), timeout=5)
+        await stream.close()
+        return stream
+
+    stream = asyncio.run(scenario())
+    comment = Comment.objects.get()
+    assert stream.status == HTTPStatus.OK
+    assert f'id: {comment.pk}\n' in stream.body
+    assert comment.text in stream.body
+
+
 def test_user_cant_use_bad_words(get_url_news_detail,
                                  not_author_client,
                                  bad_words_fixture):
@@ -52,6 +93,45 @@ def test_user_cant_use_bad_words(get_url_news_detail,
     assert comments_count == 0
 
 
+def test_rejected_comment_keeps_thread(
+        comment, get_url_news_detail, not_author_client, bad_words_fixture
+):
+    """Страница с отклонённым комментарием по-прежнему выводит ветку."""
+    response = not_author_client.post(
+        get_url_news_detail, data=bad_words_fixture
+    )
+    assert [item.pk for item in response.context['comments']] == [comment.pk]
+    assert comment.text in response.content.decode()
+    assert 'Здесь никто ничего не написал' not in response.content.decode()
+
+
+@pytest.mark.parametrize(
+    'text',
+    (
+        'Ну ты и РЕДИСКА!',
+        # Латинские «е», «с» и «а» вместо кириллических.
+        'Ну ты и редиcкa!',
+        'Ёжик-негодяй',
+    ),
+)
+def test_bad_words_found_in_disguise(
+        get_url_news_detail, not_author_client, text
+):
+    """Запрещённые слова находятся в любом регистре и с подменой букв."""
+    response = not_author_client.post(get_url_news_detail, data={'text': text})
+    assertFormError(response, form='form', field='text', errors=WARNING)
+    assert Comment.objects.count() == 0
+
+
+def test_bad_words_matcher_whole_words():
+    """В режиме целых слов часть другого слова не считается совпадением."""
+    matcher = BadWordsMatcher(('кот',), whole_words=True)
+    assert matcher.search('котлета') is None
+    assert matcher.search('Вот это кот!') == 'кот'
+    matcher.load(('котлета',))
+    assert matcher.search('котлета') == 'котлета'
+
+
 def test_author_can_delete_comment(
         author_client, get_url_comment_delete, get_url_news_detail
 ):
@@ -100,3 +180,340 @@ def test_user_cant_edit_comment_of_another_user(
     comment = get_object_or_404(Comment, pk=comment.pk)
     assert response.status_code == HTTPStatus.NOT_FOUND
     assert comment.text == 'Текст комментария'
+
+
+def test_create_comment_queries(
+        not_author_client, get_url_news_detail, form_data,
+        django_assert_num_queries
+):
+    """
+    Создание комментария: сессия, пользователь, новость, вставка
+    и счётчики новости в одной транзакции (ещё два запроса —
+    точка сохранения); для редиректа новость не запрашивается.
+    """
+    with django_assert_num_queries(7):
+        not_author_client.post(get_url_news_detail, data=form_data)
+
+
+@pytest.mark.parametrize(
+    'get_url, expected_queries',
+    (
+        (pytest.lazy_fixture('get_url_comment_edit'), 7),
+        (pytest.lazy_fixture('get_url_comment_delete'), 7),
+    ),
+)
+def test_edit_delete_comment_queries(
+        author_client, get_url, expected_queries, form_data,
+        django_assert_num_queries
+):
+    """
+    Редактирование и удаление комментария: сессия, пользователь,
+    комментарий и запись; новость для редиректа не загружается.
+    В той же транзакции у новости обновляются время изменения,
+    а при удалении — и счётчики.
+    """
+    with django_assert_num_queries(expected_queries):
+        author_client.post(get_url, data=form_data)
+
+
+@pytest.mark.parametrize(
+    'action, comments_left, flagged_count',
+    (
+        ('delete', 1, 0),
+        ('flag', 2, 1),
+    ),
+)
+def test_staff_can_moderate_comments(
+        admin_client, comment, bad_comment, get_url_moderate,
+        action, comments_left, flagged_count
+):
+    """
+    Модератор одной командой удаляет или помечает
+    все комментарии с запрещёнными словами.
+    """
+    response = admin_client.post(get_url_moderate, data={'action': action})
+    report = response.json()
+    assert response.status_code == HTTPStatus.OK
+    assert (report['checked'], report['offenders']) == (2, 1)
+    assert Comment.objects.count() == comments_left
+    assert Comment.objects.filter(flagged=True).count() == flagged_count
+    assert News.objects.get().comment_count == comments_left
+
+
+def test_moderation_limited_to_author(
+        admin_client, author, news, bad_comment, get_url_moderate
+):
+    """Проверку можно ограничить комментариями одного автора."""
+    Comment.objects.create(news=news, author=author, text=bad_comment.text)
+    response = admin_client.post(
+        get_url_moderate, data={'action': 'delete', 'author': author.pk}
+    )
+    assert response.json()['offenders'] == 1
+    assert list(Comment.objects.all()) == [bad_comment]
+
+
+def test_moderation_works_in_batches(comment, bad_comment):
+    """Пачки любого размера дают одинаковый результат проверки."""
+    report = moderate_comments(Comment.objects.all(), batch_size=1)
+    assert (report.checked, report.offenders) == (2, 1)
+    assert list(Comment.objects.all()) == [comment]
+
+
+def test_user_cant_moderate_comments(
+        author_client, bad_comment, get_url_moderate
+):
+    """Обычный пользователь не может запустить проверку комментариев."""
+    response = author_client.post(get_url_moderate, data={'action': 'delete'})
+    assert response.status_code == HTTPStatus.FORBIDDEN
+    assert Comment.objects.count() == 1
+
+
+def test_reads_go_to_replicas(settings):
+    """Чтение идёт в реплики, запись и чтение внутри primary() — нет."""
+    settings.DATABASE_REPLICAS = ['replica1', 'replica2']
+    router = ReplicaRouter()
+    assert router.db_for_read(Comment) in settings.DATABASE_REPLICAS
+    assert router.db_for_write(Comment) == PRIMARY
+    with primary():
+        assert router.db_for_read(Comment) == PRIMARY
+    assert not router.allow_migrate('replica1', 'news')
+
+
+@pytest.mark.parametrize(
+    'method, cookies, expected_db',
+    (
+        ('get', {}, 'replica1'),
+        ('post', {}, PRIMARY),
+        ('get', {PRIMARY_COOKIE: '1'}, PRIMARY),
+    ),
+)
+def test_primary_after_write(settings, rf, method, cookies, expected_db):
+    """
+    Изменяющий запрос и запросы с кукой после него читают
+    из основной базы; кука ставится после изменяющего запроса.
+    """
+    settings.DATABASE_REPLICAS = ['replica1']
+    used = []
+
+    def view(request):
+        used.append(ReplicaRouter().db_for_read(Comment))
+        return HttpResponse()
+
+    request = getattr(rf, method)('/')
+    request.COOKIES.update(cookies)
+    response = PrimaryAfterWriteMiddleware(view)(request)
+    assert used == [expected_db]
+    assert (PRIMARY_COOKIE in response.cookies) is (method == 'post')
+
+    async def async_view(request):
+        return view(request)
+
+    middleware = PrimaryAfterWriteMiddleware(async_view)
+    assert asyncio.iscoroutinefunction(middleware)
+    response = asyncio.run(middleware(request))
+    assert used == [expected_db, expected_db]
+    assert (PRIMARY_COOKIE in response.cookies) is (method == 'post')
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_requests_run_concurrently(news, monkeypatch):
+    """
+    Под ASGI middleware не заставляет асинхронные страницы ждать
+    друг друга в одном общем потоке.
+    """
+    delay = 0.3
+    requests_count = 4
+    get_context_data = NewsList.get_context_data
+
+    def slow_context(self, **kwargs):
+        time.sleep(delay)
+        return get_context_data(self, **kwargs)
+
+    monkeypatch.setattr(NewsList, 'get_context_data', slow_context)
+    url = reverse('news:home_async')
+
+    async def fetch_all():
+        client = AsyncClient()
+        return await asyncio.gather(
+            *(client.get(url) for _ in range(requests_count))
+        )
+
+    started = time.perf_counter()
+    responses = asyncio.run(fetch_all())
+    elapsed = time.perf_counter() - started
+    assert all(
+        response.status_code == HTTPStatus.OK for response in responses
+    )
+    # По очереди запросы заняли бы requests_count * delay.
+    assert elapsed < requests_count * delay * 0.75
+
+
+@pytest.mark.django_db(transaction=True)
+def test_author_sees_new_comment_before_replica(
+    news, author_client, get_url_news_detail, form_data, replica
+):
+    """
+    Сразу после комментария автор работает с ним через основную
+    базу, хотя реплика его ещё не получила.
+    """
+    author_client.post(get_url_news_detail, data=form_data)
+    comment = Comment.objects.using(PRIMARY).get()
+    assert not Comment.objects.using(replica).exists()
+    url = reverse('news:edit', args=(comment.pk,))
+    assert author_client.get(url).status_code == HTTPStatus.OK
+    author_client.cookies.pop(PRIMARY_COOKIE)
+    assert author_client.get(url).status_code == HTTPStatus.NOT_FOUND
+
+
+def test_counters_follow_comments(
+    news, not_author_client, get_url_news_detail, form_data
+):
+    """Новость хранит число комментариев и время последнего из них."""
+    not_author_client.post(get_url_news_detail, data=form_data)
+    comment = Comment.objects.get()
+    news.refresh_from_db()
+    assert (news.comment_count, news.last_comment_at) == (1, comment.created)
+    not_author_client.post(reverse('news:delete', args=(comment.pk,)))
+    news.refresh_from_db()
+    assert (news.comment_count, news.last_comment_at) == (0, None)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_counters_follow_comment_database(news, author, replica):
+    """
+    Комментарий в другой базе меняет счётчики новости в той же
+    базе, а не в основной.
+    """
+    Comment(news_id=news.pk, author_id=author.pk, text='Т').save(
+        using=replica
+    )
+    comment = Comment.objects.using(replica).create(
+        news_id=news.pk, author_id=author.pk, text='Т'
+    )
+    assert News.objects.using(replica).get().comment_count == 2
+    comment.delete()
+    assert News.objects.using(replica).get().comment_count == 1
+    assert News.objects.using(PRIMARY).get().comment_count == 0
+
+
+def test_admin_inline_updates_counters(admin_client, news, comment, author):
+    """Удаление комментария в админке тоже меняет счётчики новости."""
+    admin_client.post(
+        reverse('admin:news_news_change', args=(news.pk,)),
+        {
+            'title': news.title,
+            'text': news.text,
+            'date': f'{news.date:%Y-%m-%d}',
+            'comment_set-TOTAL_FORMS': 1,
+            'comment_set-INITIAL_FORMS': 1,
+            'comment_set-MIN_NUM_FORMS': 0,
+            'comment_set-MAX_NUM_FORMS': 1000,
+            'comment_set-0-id': comment.pk,
+            'comment_set-0-news': news.pk,
+            'comment_set-0-author': author.pk,
+            'comment_set-0-text': comment.text,
+            'comment_set-0-DELETE': 'on',
+        },
+    )
+    assert not Comment.objects.exists()
+    news.refresh_from_db()
+    assert news.comment_count == 0
+
+
+def test_recount_comments_repairs_drift(
+        many_comments, capsys, django_capture_on_commit_callbacks
+):
+    """
+    Команда пересчитывает разошедшиеся счётчики пачками
+    и сбрасывает закэшированные блоки новостей.
+    """
+    News.objects.update(comment_count=0, last_comment_at=None)
+    keys = [news_version_key(pk) for pk in News.objects.values_list(
+        'pk', flat=True
+    )]
+    versions = get_versions(*keys)
+    with django_capture_on_commit_callbacks(execute=True):
+        call_command('recount_comments', '--batch-size', '3')
+    assert all(
+        version > versions[key]
+        for key, version in get_versions(*keys).items()
+    )
+    assert not News.objects.exclude(comment_count=many_comments).exists()
+    assert not News.objects.filter(last_comment_at=None).exists()
+    assert (
+        f'Пересчитано новостей: {News.objects.count()}.'
+        in capsys.readouterr().out
+    )
+
+
+def test_concurrent_bumps_are_not_lost():
+    """Каждое из одновременных изменений сдвигает поколение."""
+    key = news_version_key(1)
+    version = get_versions(key)[key]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda _: bump_version(key), range(100)))
+    assert get_versions(key)[key] == version + 100
+
+
+@pytest.mark.parametrize('extension', ('jsonl', 'csv'))
+def test_export_import_round_trip(
+        many_comments, tmp_path, extension, capsys,
+        django_capture_on_commit_callbacks
+):
+    """
+    Выгруженные новости и комментарии загружаются обратно без
+    потерь: с прежними id, временем создания и счётчиками.
+    """
+    tables = {}
+    for model_name, model in (('news', News), ('comments', Comment)):
+        path = tmp_path / f'{model_name}.{extension}'
+        call_command('export_news', model_name, str(path))
+        tables[model_name] = (model, path, list(model.objects.values()))
+    News.objects.all().delete()
+    with django_capture_on_commit_callbacks(execute=True):
+        for model_name, (model, path, _) in tables.items():
+            call_command(
+                'import_news', model_name, str(path), '--batch-size', '7'
+            )
+    # Время изменения новостей не переносится: загрузка — тоже изменение.
+    for model, _, rows in tables.values():
+        for row in rows:
+            row.pop('modified', None)
+        assert list(model.objects.values(*rows[0])) == rows
+    assert f'Загружено строк: {len(tables["comments"][2])}' in (
+        capsys.readouterr().out
+    )
+
+
+def test_import_commits_batches_separately(news, tmp_path):
+    """Ошибка в пачке откатывает только её, прежние пачки остаются."""
+    path = tmp_path / 'news.jsonl'
+    path.write_text(
+        f'{{"id": {news.pk + 1}, "title": "Новая", "text": "Текст"}}\n'
+        f'{{"id": {news.pk}, "title": "Повтор", "text": "Текст"}}\n',
+        encoding='utf-8',
+    )
+    with pytest.raises(IntegrityError):
+        call_command('import_news', 'news', str(path), '--batch-size', '1')
+    assert News.objects.filter(title='Новая').exists()
+    assert not News.objects.filter(title='Повтор').exists()
+
+
+def test_import_comments_without_ids(news, author, tmp_path):
+    """
+    Комментарии без id загружаются, если время создания не задано;
+    время создания без id отклоняется до вставки.
+    """
+    path = tmp_path / 'comments.jsonl'
+    row = {'news_id': news.pk, 'author_id': author.pk, 'text': 'Текст'}
+    path.write_text(json.dumps(row) + '\n', encoding='utf-8')
+    call_command('import_news', 'comments', str(path))
+    assert Comment.objects.filter(text='Текст').count() == 1
+    path.write_text(
+        json.dumps({**row, 'text': 'Без id'}) + '\n'
+        + json.dumps({**row, 'created': '2020-01-01T00:00:00+00:00'}) + '\n',
+        encoding='utf-8',
+    )
+    with pytest.raises(CommandError, match='Запись 2'):
+        call_command('import_news', 'comments', str(path))
+    assert not Comment.objects.filter(text='Без id').exists()
@@ -0,0 +1,321 @@
+import asyncio
+import random
+import time
+from datetime import timedelta
+
+import pytest
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count
+from django.utils import timezone
+
+from news.broker import comments_channel, get_broker
+from news.models import Comment, News, NewsRanking
+from news.pagination import encode_news_cursor, news_after, paginate_news
+from news.rankings import PERIODS
+from news.profanity import BadWordsMatcher
+from news.views import NewsList
+
+NEWS_COUNT = 50
+AUTHORS_PER_NEWS = 20
+DICTIONARY_SIZE = 3000
+TEXT_WORDS = 10000
+ALPHABET = 'абвгдежзийклмнопрстуфхцчшщыэюя'
+SUBSCRIBERS_COUNT = 2000
+LOAD_REQUESTS = 40
+WRITERS = 4
+WRITES_PER_WRITER = 25
+SMALL_ARCHIVE = 1000
+LARGE_ARCHIVE = 50000
+TIMING_RUNS = 5
+# Запас на шум таймера: без индекса время росло бы в 50 раз.
+MAX_SLOWDOWN = 5
+
+sqlite_only = pytest.mark.skipif(
+    connection.vendor != 'sqlite',
+    reason='Планы запросов проверяются через EXPLAIN QUERY PLAN SQLite.',
+)
+
+
+def query_plan(queryset):
+    """Возвращает описание плана выполнения запроса."""
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return ' '.join(row[-1] for row in cursor.fetchall())
+
+
+@pytest.fixture
+def big_dataset(django_user_model):
+    """Много новостей, авторов и комментариев со статистикой ANALYZE."""
+    News.objects.bulk_create(
+        News(title=f'Новость {index}', text='Текст.')
+        for index in range(NEWS_COUNT)
+    )
+    django_user_model.objects.bulk_create(
+        django_user_model(username=f'Автор {index}')
+        for index in range(NEWS_COUNT)
+    )
+    authors = django_user_model.objects.all()
+    Comment.objects.bulk_create(
+        Comment(news=news, author=author, text='Комментарий')
+        for news in News.objects.all()
+        for author in authors[:AUTHORS_PER_NEWS]
+    )
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    return News.objects.first(), authors[0]
+
+
+@sqlite_only
+@pytest.mark.django_db
+def test_comment_thread_uses_index(big_dataset):
+    """Ветка комментариев читается по индексу без сортировки в памяти."""
+    news, _ = big_dataset
+    plan = query_plan(
+        news.comment_set.order_by('created', 'id')[
+            :settings.COMMENTS_PER_PAGE
+        ]
+    )
+    assert 'comment_news_created_idx' in plan
+    assert 'TEMP B-TREE' not in plan
+
+
+@sqlite_only
+@pytest.mark.django_db
+def test_author_comments_use_index(big_dataset):
+    """Комментарии автора выбираются по индексу (author, id)."""
+    _, author = big_dataset
+    plan = query_plan(Comment.objects.filter(author=author).order_by('id'))
+    assert 'comment_author_idx' in plan
+    assert 'TEMP B-TREE' not in plan
+
+
+@sqlite_only
+@pytest.mark.django_db
+def test_home_page_uses_date_index(big_dataset):
+    """Последние новости берутся из индекса по дате."""
+    plan = query_plan(NewsList(model=News).get_queryset())
+    assert 'news_date_idx' in plan
+    assert 'TEMP B-TREE' not in plan
+
+
+@sqlite_only
+@pytest.mark.django_db
+def test_news_by_activity_uses_index(big_dataset):
+    """Новости по последнему комментарию выбираются без чтения комментариев."""
+    plan = query_plan(
+        News.objects.order_by('-last_comment_at')[:NEWS_COUNT]
+    )
+    assert 'news_last_comment_idx' in plan
+    assert 'news_comment' not in plan
+    assert 'TEMP B-TREE' not in plan
+
+
+@sqlite_only
+@pytest.mark.django_db
+def test_rankings_refresh_uses_index(big_dataset):
+    """Комментарии за период читаются диапазоном из индекса по дате."""
+    plan = query_plan(
+        Comment.objects.filter(
+            created__gte=timezone.now() - PERIODS[NewsRanking.DAY]
+        ).values('news').annotate(comments=Count('pk'))
+    )
+    assert 'comment_created_idx' in plan
+
+
+@sqlite_only
+@pytest.mark.django_db
+def test_discussed_page_uses_index(big_dataset):
+    """Страница рейтинга читает свои места по индексу без сортировки."""
+    plan = query_plan(
+        NewsRanking.objects.filter(
+            period=NewsRanking.DAY, position__gt=settings.NEWS_PER_PAGE
+        ).select_related('news').order_by('position')[
+            :settings.NEWS_PER_PAGE
+        ]
+    )
+    assert '(period=? AND position>?)' in plan
+    assert 'TEMP B-TREE' not in plan
+
+
+def archive_page(cursor):
+    """Страница архива за последний год, начиная с курсора."""
+    return paginate_news(
+        News.objects.filter(
+            date__gte=timezone.now().date() - timedelta(days=365)
+        ),
+        cursor,
+        settings.NEWS_PER_PAGE,
+    )
+
+
+def add_archive_news(count):
+    """Новости по сто в день назад от сегодняшнего дня."""
+    today = timezone.now().date()
+    News.objects.bulk_create(
+        (
+            News(
+                title=f'Новость {index}',
+                text='Текст.',
+                date=today - timedelta(days=index // 100),
+            )
+            for index in range(count)
+        ),
+        batch_size=1000,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def best_time(function, *args):
+    timings = []
+    for _ in range(TIMING_RUNS):
+        started = time.perf_counter()
+        function(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+@sqlite_only
+@pytest.mark.django_db
+def test_archive_page_uses_index():
+    """Архив листается по индексу по дате без сортировки в памяти."""
+    add_archive_news(SMALL_ARCHIVE)
+    _, cursor = archive_page(None)
+    plan = query_plan(
+        news_after(News.objects.all(), cursor)[:settings.NEWS_PER_PAGE]
+    )
+    assert 'news_date_idx' in plan
+    assert 'TEMP B-TREE' not in plan
+
+
+@pytest.mark.django_db
+def test_archive_page_time_does_not_grow():
+    """
+    Страница из середины архива открывается за одно время
+    и при тысяче новостей, и при пятидесяти тысячах.
+    """
+    timings = []
+    for count in (SMALL_ARCHIVE, LARGE_ARCHIVE - SMALL_ARCHIVE):
+        add_archive_news(count)
+        middle = news_after(News.objects.all(), None)[SMALL_ARCHIVE // 2]
+        timings.append(
+            best_time(archive_page, encode_news_cursor(middle))
+        )
+    small, large = timings
+    assert large < small * MAX_SLOWDOWN
+
+
+def random_word(rng, min_length, max_length):
+    return ''.join(
+        rng.choice(ALPHABET)
+        for _ in range(rng.randint(min_length, max_length))
+    )
+
+
+def test_bad_words_matcher_outperforms_loop():
+    """
+    Автомат проверяет длинный текст по большому словарю
+    быстрее, чем поочерёдный поиск каждого слова.
+    """
+    rng = random.Random(0)
+    words = [random_word(rng, 5, 10) for _ in range(DICTIONARY_SIZE)]
+    text = ' '.join(random_word(rng, 2, 9) for _ in range(TEXT_WORDS))
+    matcher = BadWordsMatcher(words)
+
+    start = time.perf_counter()
+    found = matcher.search(text)
+    matcher_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    lowered_text = text.lower()
+    expected = next((word for word in words if word in lowered_text), None)
+    loop_time = time.perf_counter() - start
+
+    assert (found is None) is (expected is None)
+    assert matcher_time < loop_time
+
+
+@pytest.mark.django_db(transaction=True)
+def test_many_idle_subscribers(event_stream, news):
+    """
+    Один процесс держит тысячи простаивающих подписчиков ленты
+    и доставляет комментарий, опубликованный из другого потока,
+    всем им; отключившиеся подписчики не остаются в брокере.
+    """
+    channel = comments_channel(news.pk)
+    message = {'id': 1, 'author_id': 1, 'html': 'Комментарий'}
+
+    async def scenario():
+        streams = [
+            event_stream(news.pk).open() for _ in range(SUBSCRIBERS_COUNT)
+        ]
+        await asyncio.gather(*(stream.started.wait() for stream in streams))
+        subscribed = get_broker().subscribers_count(channel)
+        await asyncio.to_thread(get_broker().publish, channel, message)
+        await asyncio.wait_for(
+            asyncio.gather(*(stream.received.wait() for stream in streams)),
+            timeout=10,
+        )
+        await asyncio.gather(*(stream.close() for stream in streams))
+        return streams, subscribed
+
+    streams, subscribed = asyncio.run(scenario())
+    assert subscribed == SUBSCRIBERS_COUNT
+    assert all('event: comment' in stream.body for stream in streams)
+    assert get_broker().subscribers_count(channel) == 0
+
+
+@pytest.mark.parametrize('deployment', ('wsgi', 'asgi'))
+@pytest.mark.django_db(transaction=True)
+def test_benchmark_deployments_command(news, capsys, deployment):
+    """Команда нагружает локальный сервер и печатает задержки."""
+    call_command(
+        'benchmark_deployments',
+        '--deployments', deployment,
+        '--news', str(news.pk),
+        '--requests', str(LOAD_REQUESTS),
+        '--concurrency', '8',
+        '--wsgi-threads', '2',
+        '--client-delay', '0.01',
+    )
+    output = capsys.readouterr().out
+    # Под ASGI нагружаются асинхронные версии страниц.
+    prefix = '/async' if deployment == 'asgi' else ''
+    for path in ('/', f'/news/{news.pk}/'):
+        assert f'{deployment.upper()} {prefix}{path}: ' in output
+    assert output.count('ошибок: 0') == 2
+
+
+@sqlite_only
+@pytest.mark.django_db
+def test_sqlite_connection_tuned():
+    """Подключения к SQLite получают PRAGMA из настроек проекта."""
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA synchronous')
+        assert cursor.fetchone()[0] == 1
+        cursor.execute('PRAGMA busy_timeout')
+        assert cursor.fetchone()[0] == 5000
+    assert connection.transaction_mode == 'IMMEDIATE'
+
+
+@sqlite_only
+@pytest.mark.django_db(transaction=True)
+def test_benchmark_writers_command(capsys):
+    """
+    Параллельные писатели не получают «database is locked»
+    с настройками проекта.
+    """
+    call_command(
+        'benchmark_writers',
+        '--writers', str(WRITERS),
+        '--writes', str(WRITES_PER_WRITER),
+    )
+    output = capsys.readouterr().out
+    assert (
+        f'bench_tuned: записей: {WRITERS * WRITES_PER_WRITER}, '
+        '«database is locked»: 0'
+    ) in output
@@ -1,3 +1,5 @@
+import asyncio
+
 import pytest
 from http import HTTPStatus
 
@@ -9,7 +11,8 @@ pytestmark = pytest.mark.django_db
 
 @pytest.mark.parametrize(
     'name',
-    ('news:home', 'users:login', 'users:logout', 'users:signup')
+    ('news:home', 'news:search', 'news:archive', 'users:login',
+     'users:logout', 'users:signup')
 )
 def test_pages_availability_for_anonymous_user(client, name):
     """
@@ -21,6 +24,20 @@ def test_pages_availability_for_anonymous_user(client, name):
     assert response.status_code == HTTPStatus.OK
 
 
+@pytest.mark.parametrize(
+    'period, expected_status',
+    (
+        ('day', HTTPStatus.OK),
+        ('week', HTTPStatus.OK),
+        ('month', HTTPStatus.NOT_FOUND),
+    )
+)
+def test_discussed_page_availability(client, period, expected_status):
+    """Обсуждаемое доступно только за сутки и за неделю."""
+    response = client.get(reverse('news:discussed', args=(period,)))
+    assert response.status_code == expected_status
+
+
 def test_detail_page_availability(get_url_news_detail, client):
     """
     Страница отдельной новости
@@ -72,3 +89,14 @@ def redirect_to_login_from_comments(get_url, url_user_login, client):
     expected_url = f'{url_user_login}?next={get_url}'
     response = client.get(get_url)
     assertRedirects(response, expected_url)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_events_for_missing_news(event_stream):
+    """Лента комментариев несуществующей новости отвечает 404."""
+    async def connect():
+        stream = event_stream(0).open()
+        await stream.task
+        return stream
+
+    assert asyncio.run(connect()).status == HTTPStatus.NOT_FOUND
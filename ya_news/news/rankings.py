@@ -0,0 +1,46 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Comment, NewsRanking
+
+PERIODS = {
+    NewsRanking.DAY: timedelta(days=1),
+    NewsRanking.WEEK: timedelta(days=7),
+}
+
+
+def refresh_rankings(now=None):
+    """
+    Пересчитывает самые обсуждаемые новости за каждый период.
+
+    Комментарии за период читаются диапазоном из индекса
+    (created, news), не касаясь остальных строк таблицы.
+    Старые места заменяются новыми в одной транзакции, поэтому
+    читатели видят либо прежний, либо новый рейтинг целиком.
+    """
+    now = now or timezone.now()
+    sizes = {}
+    for period, length in PERIODS.items():
+        top = Comment.objects.filter(created__gte=now - length).values(
+            'news'
+        ).annotate(comments=Count('pk')).order_by(
+            '-comments', 'news'
+        )[:settings.NEWS_RANKING_SIZE]
+        rankings = [
+            NewsRanking(
+                period=period,
+                position=position,
+                news_id=row['news'],
+                comments=row['comments'],
+            )
+            for position, row in enumerate(top, 1)
+        ]
+        with transaction.atomic():
+            NewsRanking.objects.filter(period=period).delete()
+            NewsRanking.objects.bulk_create(rankings)
+        sizes[period] = len(rankings)
+    return sizes
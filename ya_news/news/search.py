@@ -0,0 +1,126 @@
+import re
+from collections import namedtuple
+
+from django.db import connections, router
+from django.db.models import Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Comment, News
+
+WORD = re.compile(r'\w+')
+# Самые частые окончания русских слов: без них запрос «новости»
+# превращается в префикс «новост*» и находит все формы слова.
+RUSSIAN_ENDING = re.compile(
+    r'(ами|ями|ого|его|ому|ему|ыми|ими|ой|ей|ий|ый|ая|яя|ое|ее|ые|ие'
+    r'|ам|ям|ах|ях|ом|ем|ов|ев|а|я|о|е|ы|и|у|ю|ь)$'
+)
+MIN_STEM_LENGTH = 3
+# Границы найденных слов во фрагменте; заменяются на <mark>
+# уже после экранирования текста.
+MARK_START, MARK_END = '\x02', '\x03'
+SNIPPET_TOKENS = 12
+FALLBACK_SNIPPET_LENGTH = 200
+
+SEARCH_SQL = f"""
+    SELECT
+        news_news_fts.rowid AS news_id,
+        NULL AS comment_id,
+        snippet(
+            news_news_fts, -1, '{MARK_START}', '{MARK_END}', '…',
+            {SNIPPET_TOKENS}
+        ) AS snippet,
+        bm25(news_news_fts, 10.0, 1.0) AS rank
+    FROM news_news_fts
+    WHERE news_news_fts MATCH %s
+    UNION ALL
+    SELECT
+        news_comment.news_id,
+        news_comment.id,
+        snippet(
+            news_comment_fts, 0, '{MARK_START}', '{MARK_END}', '…',
+            {SNIPPET_TOKENS}
+        ),
+        bm25(news_comment_fts)
+    FROM news_comment_fts
+    JOIN news_comment ON news_comment.id = news_comment_fts.rowid
+    WHERE news_comment_fts MATCH %s
+    ORDER BY rank
+    LIMIT %s OFFSET %s
+"""
+
+SearchResult = namedtuple('SearchResult', ('news', 'comment_id', 'snippet'))
+
+
+def stem(word):
+    """Отрезает окончание у русского слова, оставляя хотя бы три буквы."""
+    word = word.lower().replace('ё', 'е')
+    stemmed = RUSSIAN_ENDING.sub('', word)
+    return stemmed if len(stemmed) >= MIN_STEM_LENGTH else word
+
+
+def build_match_query(text):
+    """
+    Превращает пользовательский ввод в запрос FTS5.
+
+    Каждое слово берётся в кавычки (синтаксис FTS5 в запросе не
+    работает) и ищется по префиксу; все слова должны встретиться.
+    """
+    return ' '.join(f'"{stem(word)}"*' for word in WORD.findall(text))
+
+
+def highlight(snippet):
+    """Экранирует фрагмент и выделяет в нём найденные слова."""
+    return mark_safe(
+        escape(snippet)
+        .replace(MARK_START, '<mark>')
+        .replace(MARK_END, '</mark>')
+    )
+
+
+def fallback_search(text, limit, offset, using):
+    """Поиск без полнотекстового индекса для баз, отличных от SQLite."""
+    news = News.objects.using(using).filter(
+        Q(title__icontains=text) | Q(text__icontains=text)
+    ).values_list('id', 'text')
+    comments = Comment.objects.using(using).filter(
+        text__icontains=text
+    ).values_list('news_id', 'id', 'text')
+    rows = [(news_id, None, body) for news_id, body in news[:offset + limit]]
+    rows += list(comments[:offset + limit])
+    return [
+        (news_id, comment_id, body[:FALLBACK_SNIPPET_LENGTH])
+        for news_id, comment_id, body in rows[offset:offset + limit]
+    ]
+
+
+def search(text, limit, offset=0):
+    """
+    Новости и комментарии, подходящие под запрос, от лучших к худшим.
+
+    Совпадения ищутся в индексах FTS5, которые триггеры обновляют
+    при каждом изменении новостей и комментариев; из таблиц
+    читаются только найденные строки. Индекс и таблицы читаются
+    из одной базы (реплики, если они есть).
+    """
+    match_query = build_match_query(text)
+    if not match_query:
+        return []
+    using = router.db_for_read(News)
+    connection = connections[using]
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                SEARCH_SQL, (match_query, match_query, limit, offset)
+            )
+            rows = [row[:3] for row in cursor.fetchall()]
+    else:
+        rows = fallback_search(text, limit, offset, using)
+    news = News.objects.using(using).only('id', 'title', 'date').in_bulk(
+        {news_id for news_id, _, _ in rows}
+    )
+    # Новость могли удалить между двумя запросами.
+    return [
+        SearchResult(news[news_id], comment_id, highlight(snippet))
+        for news_id, comment_id, snippet in rows if news_id in news
+    ]
@@ -0,0 +1,27 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import HOME_PAGE_VERSION_KEY, bump_version, news_version_key
+from .models import Comment, News
+
+
+@receiver((post_save, post_delete), sender=News)
+def news_changed(sender, instance, **kwargs):
+    """
+    Изменение новости меняет и список главной страницы, и её блок.
+
+    Поколения сбрасываются только после фиксации транзакции, иначе
+    параллельный запрос успел бы закэшировать ещё старые данные
+    под новым поколением.
+    """
+    news_id = instance.pk
+    transaction.on_commit(lambda: bump_version(HOME_PAGE_VERSION_KEY))
+    transaction.on_commit(lambda: bump_version(news_version_key(news_id)))
+
+
+@receiver((post_save, post_delete), sender=Comment)
+def comment_changed(sender, instance, **kwargs):
+    """Изменение комментария меняет число комментариев у новости."""
+    news_id = instance.news_id
+    transaction.on_commit(lambda: bump_version(news_version_key(news_id)))
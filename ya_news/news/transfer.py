@@ -0,0 +1,165 @@
+import csv
+import json
+from itertools import islice
+
+from django.core.management.base import CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+
+from .cache import bump_news_versions
+from .models import Comment, News
+
+JSONL, CSV = 'jsonl', 'csv'
+FORMATS = (JSONL, CSV)
+# Счётчики комментариев не переносятся: после загрузки они
+# пересчитываются по самим комментариям.
+MODELS = {
+    'news': (News, ('id', 'title', 'text', 'date')),
+    'comments': (
+        Comment, ('id', 'news_id', 'author_id', 'text', 'created', 'flagged')
+    ),
+}
+
+
+def guess_format(path):
+    return CSV if path.endswith('.csv') else JSONL
+
+
+def encode(value):
+    """Даты и время в ISO 8601 с микросекундами."""
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def export_rows(queryset, columns, stream, file_format, chunk_size):
+    """
+    Пишет строки queryset в поток, не держа их в памяти.
+
+    Строки читаются курсором базы через iterator() пачками
+    по chunk_size; возвращает число записанных строк.
+    """
+    rows = queryset.order_by('pk').values_list(*columns).iterator(
+        chunk_size=chunk_size
+    )
+    if file_format == CSV:
+        writer = csv.writer(stream)
+        writer.writerow(columns)
+    count = 0
+    for row in rows:
+        if file_format == CSV:
+            writer.writerow([encode(value) for value in row])
+        else:
+            stream.write(json.dumps(
+                {name: encode(value) for name, value in zip(columns, row)},
+                ensure_ascii=False,
+            ) + '\n')
+        count += 1
+    return count
+
+
+def read_rows(stream, file_format):
+    """Словари строк файла; файл разбирается построчно."""
+    if file_format == CSV:
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def auto_now_add_fields(model):
+    return [
+        field.attname for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now_add', False)
+    ]
+
+
+def build_objects(model, columns, rows):
+    """
+    Объекты модели из строк; строковые значения CSV приводятся к типам.
+
+    Время создания из файла возвращается после вставки обновлением
+    по id, а SQLite id вставленных строк не сообщает: строка со
+    временем создания, но без id, отклоняется до вставки её пачки.
+    """
+    fields = {name: model._meta.get_field(name) for name in columns}
+    stamps = [name for name in auto_now_add_fields(model) if name in fields]
+    for number, row in enumerate(rows, start=1):
+        values = {
+            name: fields[name].to_python(row[name])
+            for name in columns if name in row
+        }
+        if values.get(model._meta.pk.attname) is None and any(
+            values.get(name) is not None for name in stamps
+        ):
+            raise CommandError(
+                f'Запись {number}: время создания загружается '
+                f'только вместе с id.'
+            )
+        yield model(**values)
+
+
+def insert_batch(model, batch):
+    """
+    Вставляет пачку, сохраняя время создания из файла.
+
+    bulk_create, как и save, подставляет текущее время в поля
+    с auto_now_add; значения из файла возвращаются одним
+    массовым обновлением по id сразу после вставки.
+    """
+    fields = auto_now_add_fields(model)
+    values = [[getattr(obj, name) for name in fields] for obj in batch]
+    model.objects.bulk_create(batch)
+    kept = []
+    for obj, row in zip(batch, values):
+        if any(value is not None for value in row):
+            for name, value in zip(fields, row):
+                if value is not None:
+                    setattr(obj, name, value)
+            kept.append(obj)
+    if kept:
+        model.objects.bulk_update(kept, fields)
+
+
+def reset_sequences(model):
+    """Счётчики первичных ключей продолжают загруженные id (PostgreSQL)."""
+    statements = connection.ops.sequence_reset_sql(no_style(), [model])
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def refresh_after_import(model, batch):
+    """
+    Обновляет то, что bulk_create обходит: счётчики и поколения кэша.
+
+    Сигналы и save() при массовой вставке не вызываются, поэтому
+    счётчики новостей пересчитываются по затронутым новостям
+    в той же транзакции, а поколения сбрасываются после фиксации.
+    """
+    news_ids = set()
+    if model is Comment:
+        news_ids = {comment.news_id for comment in batch}
+        News.objects.filter(pk__in=news_ids).refresh_comment_counters()
+    bump_news_versions(news_ids)
+
+
+def import_rows(model, columns, rows, batch_size):
+    """
+    Вставляет строки пачками по batch_size, каждую в своей транзакции.
+
+    В памяти одновременно держится только текущая пачка; при
+    ошибке откатывается лишь она, загруженные раньше пачки остаются.
+    Возвращает число вставленных строк.
+    """
+    objects = build_objects(model, columns, rows)
+    count = 0
+    while True:
+        batch = list(islice(objects, batch_size))
+        if not batch:
+            break
+        with transaction.atomic():
+            insert_batch(model, batch)
+            refresh_after_import(model, batch)
+        count += len(batch)
+    reset_sequences(model)
+    return count
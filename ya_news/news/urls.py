@@ -6,11 +6,40 @@ app_name = 'news'
 
 urlpatterns = [
     path('', views.NewsList.as_view(), name='home'),
+    path('search/', views.NewsSearch.as_view(), name='search'),
+    path(
+        'discussed/<str:period>/',
+        views.NewsDiscussed.as_view(),
+        name='discussed'
+    ),
+    path('archive/', views.NewsArchive.as_view(), name='archive'),
+    path('api/news/', views.NewsListApi.as_view(), name='api_list'),
+    path(
+        'api/news/<int:pk>/',
+        views.NewsDetailApi.as_view(),
+        name='api_detail'
+    ),
     path('news/<int:pk>/', views.NewsDetailView.as_view(), name='detail'),
+    path('async/', views.news_list_async, name='home_async'),
+    path(
+        'async/news/<int:pk>/',
+        views.news_detail_async,
+        name='detail_async'
+    ),
+    path(
+        'news/<int:pk>/comments/',
+        views.CommentList.as_view(),
+        name='comments'
+    ),
     path(
         'delete_comment/<int:pk>/',
         views.CommentDelete.as_view(),
         name='delete'
     ),
     path('edit_comment/<int:pk>/', views.CommentUpdate.as_view(), name='edit'),
+    path(
+        'moderate_comments/',
+        views.CommentModeration.as_view(),
+        name='moderate'
+    ),
 ]
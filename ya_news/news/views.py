@@ -1,11 +1,82 @@
+import hashlib
+from collections import namedtuple
+from datetime import date
+
+from asgiref.sync import sync_to_async
 from django.conf import settings
-from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.auth.mixins import (
+    LoginRequiredMixin, UserPassesTestMixin
+)
+from django.db import close_old_connections, transaction
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404
+from django.template.loader import render_to_string
+from django.template.response import SimpleTemplateResponse
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from django.urls import reverse
 from django.views import generic
 
-from .forms import CommentForm
-from .models import Comment, News
+from yanews.db_router import primary
+
+from .cache import (
+    comment_page_key, get_cache, home_page_key, news_block_keys
+)
+from .events import publish_comment
+from .forms import CommentForm, ModerationForm
+from .models import Comment, News, NewsRanking
+from .moderation import moderate_comments
+from .pagination import (
+    MAX_INT, decode_cursor, format_cursor, paginate_comments, paginate_news,
+    parse_int
+)
+from .search import search
+
+CachedComment = namedtuple('CachedComment', ('pk', 'author_id', 'html'))
+
+
+def get_comment_page(news_id, cursor):
+    """
+    Страница комментариев к новости и курсор следующей страницы.
+
+    Комментарии рендерятся один раз и кэшируются без учёта
+    пользователя: ссылки на редактирование и удаление
+    шаблон добавляет сам по author_id.
+
+    Кэш общий для всех, поэтому он заполняется из основной базы,
+    а не из реплики, которая могла ещё не получить изменения.
+    Ключ строится по разобранному курсору: « 1-5», «01-5» и «1-5»
+    ведут на одну страницу и в один ключ из цифр и дефиса.
+    """
+    if cursor:
+        cursor = format_cursor(*decode_cursor(cursor))
+    cache = get_cache()
+    key = comment_page_key(news_id, cursor)
+    page = cache.get(key)
+    if page is None:
+        with primary():
+            comments, next_cursor = paginate_comments(
+                Comment.objects.filter(news_id=news_id).select_related(
+                    'author'
+                ),
+                cursor,
+                settings.COMMENTS_PER_PAGE,
+            )
+        page = (
+            [
+                CachedComment(
+                    comment.pk,
+                    comment.author_id,
+                    render_to_string(
+                        'news/comment.html', {'comment': comment}
+                    ),
+                )
+                for comment in comments
+            ],
+            next_cursor,
+        )
+        cache.set(key, page, settings.NEWS_CACHE_TIMEOUT)
+    return page
 
 
 class NewsList(generic.ListView):
@@ -18,22 +89,80 @@ class NewsList(generic.ListView):
         Выводим только несколько последних новостей.
 
         Их количество определяется в настройках проекта.
+        Число комментариев хранится в самой новости: таблица
+        комментариев для главной страницы не читается.
         """
-        return self.model.objects.prefetch_related(
-            'comment_set'
-        )[:settings.NEWS_COUNT_ON_HOME_PAGE]
+        return self.model.objects.all()[:settings.NEWS_COUNT_ON_HOME_PAGE]
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['news_blocks'] = self.get_news_blocks()
+        return context
+
+    def get_news_blocks(self):
+        """
+        Собирает главную страницу из закэшированных блоков новостей.
+
+        Список новостей сбрасывается при изменении любой новости,
+        блок новости — при изменении её самой или её комментариев.
+        Из базы (основной, как и для всего кэша) читаются только
+        новости с устаревшими блоками.
+        """
+        cache = get_cache()
+        news_list_key = home_page_key()
+        news_ids = cache.get(news_list_key)
+        news_list = None
+        if news_ids is None:
+            with primary():
+                news_list = list(self.object_list)
+            news_ids = [news.pk for news in news_list]
+            cache.set(news_list_key, news_ids, settings.NEWS_CACHE_TIMEOUT)
+        block_keys = news_block_keys(news_ids)
+        blocks = cache.get_many(block_keys.values())
+        missing_ids = [
+            news_id for news_id, key in block_keys.items()
+            if key not in blocks
+        ]
+        if missing_ids:
+            if news_list is None:
+                with primary():
+                    news_list = list(
+                        self.model.objects.filter(pk__in=missing_ids)
+                    )
+            rendered = {
+                block_keys[news.pk]: render_to_string(
+                    'news/home_item.html', {'news': news}
+                )
+                for news in news_list if news.pk in missing_ids
+            }
+            cache.set_many(rendered, settings.NEWS_CACHE_TIMEOUT)
+            blocks.update(rendered)
+        return [blocks[block_keys[news_id]] for news_id in news_ids]
 
 
-class NewsDetail(generic.DetailView):
+class CommentPageMixin:
+    """
+    Первая страница комментариев к новости self.object.
+
+    Страница новости показывает её и при выводе, и после
+    отклонённого комментария.
+    """
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['comments'], context['next_cursor'] = get_comment_page(
+            self.object.pk, None
+        )
+        context['news_id'] = self.object.pk
+        return context
+
+
+class NewsDetail(CommentPageMixin, generic.DetailView):
     model = News
     template_name = 'news/detail.html'
 
     def get_object(self, queryset=None):
-        obj = get_object_or_404(
-            self.model.objects.prefetch_related('comment_set__author'),
-            pk=self.kwargs['pk']
-        )
-        return obj
+        return get_object_or_404(self.model, pk=self.kwargs['pk'])
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -42,8 +171,23 @@ class NewsDetail(generic.DetailView):
         return context
 
 
+class CommentList(generic.TemplateView):
+    """Следующая страница комментариев к новости (кнопка «Показать ещё»)."""
+    template_name = 'news/comments.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        news_id = self.kwargs['pk']
+        context['comments'], context['next_cursor'] = get_comment_page(
+            news_id, self.request.GET.get('after')
+        )
+        context['news_id'] = news_id
+        return context
+
+
 class NewsComment(
         LoginRequiredMixin,
+        CommentPageMixin,
         generic.detail.SingleObjectMixin,
         generic.FormView
 ):
@@ -60,11 +204,14 @@ class NewsComment(
         comment.news = self.object
         comment.author = self.request.user
         comment.save()
+        transaction.on_commit(lambda: publish_comment(comment))
         return super().form_valid(form)
 
     def get_success_url(self):
-        post = self.get_object()
-        return reverse('news:detail', kwargs={'pk': post.pk}) + '#comments'
+        """Новость уже загружена в post(), повторно её не запрашиваем."""
+        return reverse(
+            'news:detail', kwargs={'pk': self.object.pk}
+        ) + '#comments'
 
 
 class NewsDetailView(generic.View):
@@ -78,19 +225,60 @@ class NewsDetailView(generic.View):
         return view(request, *args, **kwargs)
 
 
+def offload(view):
+    """
+    Асинхронная версия синхронного представления для ASGI.
+
+    Под ASGI Django 3.2 выполняет все синхронные представления
+    в одном общем потоке, и медленный запрос задерживает остальные.
+    Здесь представление вместе с рендерингом шаблона выполняется
+    в пуле потоков. У каждого потока своё соединение с базой;
+    оно закрывается так же, как в конце обычного запроса.
+    """
+    def run(request, *args, **kwargs):
+        close_old_connections()
+        try:
+            response = view(request, *args, **kwargs)
+            if isinstance(response, SimpleTemplateResponse):
+                response.render()
+            return response
+        finally:
+            close_old_connections()
+
+    run_in_thread = sync_to_async(run, thread_sensitive=False)
+
+    async def async_view(request, *args, **kwargs):
+        return await run_in_thread(request, *args, **kwargs)
+    return async_view
+
+
+news_list_async = offload(NewsList.as_view())
+news_detail_async = offload(NewsDetailView.as_view())
+
+
 class CommentBase(LoginRequiredMixin):
     """Базовый класс для работы с комментариями."""
     model = Comment
 
     def get_success_url(self):
-        comment = self.get_object()
+        """
+        Адрес строим по news_id уже загруженного комментария,
+        не обращаясь к базе за новостью.
+        """
         return reverse(
-            'news:detail', kwargs={'pk': comment.news.pk}
+            'news:detail', kwargs={'pk': self.object.news_id}
         ) + '#comments'
 
     def get_queryset(self):
-        """Пользователь может работать только со своими комментариями."""
-        return self.model.objects.filter(author=self.request.user)
+        """
+        Пользователь может работать только со своими комментариями.
+
+        Заголовок новости нужен шаблонам, поэтому новость
+        подтягиваем тем же запросом.
+        """
+        return self.model.objects.filter(
+            author=self.request.user
+        ).select_related('news')
 
 
 class CommentUpdate(CommentBase, generic.UpdateView):
@@ -102,3 +290,230 @@ class CommentUpdate(CommentBase, generic.UpdateView):
 class CommentDelete(CommentBase, generic.DeleteView):
     """Удаление комментария."""
     template_name = 'news/delete.html'
+
+
+class CommentModeration(LoginRequiredMixin, UserPassesTestMixin, generic.View):
+    """
+    Массовая проверка комментариев на запрещённые слова.
+
+    Проверяются все комментарии, комментарии к новости или
+    комментарии автора; в ответ приходит отчёт о проверке.
+    """
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def post(self, request, *args, **kwargs):
+        form = ModerationForm(request.POST)
+        if not form.is_valid():
+            return JsonResponse({'errors': form.errors}, status=400)
+        report = moderate_comments(
+            form.get_queryset(), form.cleaned_data['action']
+        )
+        return JsonResponse({
+            **report._asdict(), 'per_second': report.per_second
+        })
+
+
+class NewsSearch(generic.TemplateView):
+    """Поиск по новостям и комментариям."""
+    template_name = 'news/search.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        query = self.request.GET.get('q', '')
+        per_page = settings.SEARCH_RESULTS_PER_PAGE
+        try:
+            page = parse_int(self.request.GET.get('page', 1))
+        except ValueError:
+            raise Http404('Некорректный номер страницы.')
+        # Смещение страницы тоже должно уместиться в BIGINT.
+        if not 1 <= page <= MAX_INT // per_page:
+            raise Http404('Некорректный номер страницы.')
+        results = search(query, per_page + 1, (page - 1) * per_page)
+        context.update(
+            query=query,
+            results=results[:per_page],
+            next_page=page + 1 if len(results) > per_page else None,
+        )
+        return context
+
+
+class NewsDiscussed(generic.TemplateView):
+    """
+    Самые обсуждаемые новости за сутки или неделю.
+
+    Места берутся из таблицы рейтинга, которую периодически
+    пересчитывает команда refresh_rankings; страница читает
+    только свои места по индексу (period, position).
+    """
+    template_name = 'news/discussed.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        period = self.kwargs['period']
+        periods = dict(NewsRanking.PERIODS)
+        if period not in periods:
+            raise Http404('Неизвестный период.')
+        try:
+            after = parse_int(self.request.GET.get('after', 0))
+        except ValueError:
+            raise Http404('Некорректный курсор.')
+        per_page = settings.NEWS_PER_PAGE
+        rankings = list(
+            NewsRanking.objects.filter(
+                period=period, position__gt=after
+            ).select_related('news').order_by('position')[:per_page + 1]
+        )
+        context.update(
+            period=period,
+            periods=NewsRanking.PERIODS,
+            rankings=rankings[:per_page],
+            next_position=(
+                rankings[per_page - 1].position
+                if len(rankings) > per_page else None
+            ),
+        )
+        return context
+
+
+class NewsArchive(generic.TemplateView):
+    """Новости за выбранные даты, страницами по курсору."""
+    template_name = 'news/archive.html'
+
+    def get_date(self, name):
+        value = self.request.GET.get(name)
+        if not value:
+            return None
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            raise Http404('Некорректная дата.')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        start, end = self.get_date('start'), self.get_date('end')
+        news = News.objects.all()
+        if start:
+            news = news.filter(date__gte=start)
+        if end:
+            news = news.filter(date__lte=end)
+        context['news_list'], context['next_cursor'] = paginate_news(
+            news, self.request.GET.get('after'), settings.NEWS_PER_PAGE
+        )
+        context.update(start=start, end=end)
+        return context
+
+
+def news_list_state(request):
+    """
+    Id и время изменения новостей списка, одним запросом на запрос.
+
+    Берутся из основной базы, а не из кэша: кэш может быть своим
+    у каждого процесса. Комментарии при этом не читаются — их
+    изменения отражаются во времени изменения новости.
+    """
+    if not hasattr(request, 'news_list_state'):
+        with primary():
+            request.news_list_state = list(
+                News.objects.values_list('pk', 'modified')[
+                    :settings.NEWS_COUNT_ON_HOME_PAGE
+                ]
+            )
+    return request.news_list_state
+
+
+def news_list_etag(request, *args, **kwargs):
+    state = ';'.join(
+        f'{pk}:{modified.isoformat()}'
+        for pk, modified in news_list_state(request)
+    )
+    return hashlib.md5(state.encode()).hexdigest()
+
+
+def news_list_last_modified(request, *args, **kwargs):
+    return max(
+        (modified for _, modified in news_list_state(request)), default=None
+    )
+
+
+def news_modified(request, pk):
+    """Время изменения новости или её комментариев."""
+    if not hasattr(request, 'news_modified'):
+        with primary():
+            request.news_modified = News.objects.filter(pk=pk).values_list(
+                'modified', flat=True
+            ).first()
+    return request.news_modified
+
+
+def news_etag(request, pk):
+    modified = news_modified(request, pk)
+    return modified and f'{pk}:{modified.isoformat()}'
+
+
+def news_last_modified(request, pk):
+    return news_modified(request, pk)
+
+
+@method_decorator(
+    condition(
+        etag_func=news_list_etag, last_modified_func=news_list_last_modified
+    ),
+    name='get',
+)
+class NewsListApi(generic.View):
+    """
+    Последние новости в JSON; неизменившийся список — ответ 304.
+
+    Ответ клиенты кэшируют по версии, поэтому он читается
+    из основной базы, а не из реплики.
+    """
+
+    @method_decorator(primary())
+    def get(self, request, *args, **kwargs):
+        news_list = News.objects.values(
+            'id', 'title', 'text', 'date', 'comment_count'
+        )[:settings.NEWS_COUNT_ON_HOME_PAGE]
+        return JsonResponse({'news': list(news_list)})
+
+
+@method_decorator(
+    condition(etag_func=news_etag, last_modified_func=news_last_modified),
+    name='get',
+)
+class NewsDetailApi(generic.View):
+    """
+    Новость со страницей комментариев в JSON.
+
+    Если новость и комментарии не менялись, отвечаем 304,
+    прочитав только время изменения новости. Как и список, ответ
+    читается из основной базы.
+    """
+
+    @method_decorator(primary())
+    def get(self, request, *args, **kwargs):
+        news = get_object_or_404(
+            News.objects.values('id', 'title', 'text', 'date'),
+            pk=self.kwargs['pk'],
+        )
+        comments, next_cursor = paginate_comments(
+            Comment.objects.filter(news_id=news['id']).select_related(
+                'author'
+            ),
+            request.GET.get('after'),
+            settings.COMMENTS_PER_PAGE,
+        )
+        return JsonResponse({
+            **news,
+            'comments': [
+                {
+                    'id': comment.pk,
+                    'author': comment.author.get_username(),
+                    'text': comment.text,
+                    'created': comment.created,
+                }
+                for comment in comments
+            ],
+            'next': next_cursor,
+        })
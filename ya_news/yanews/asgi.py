@@ -3,6 +3,10 @@ ASGI config for yanews project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Лента новых комментариев (/news/<pk>/events/) обслуживается
+асинхронно, минуя Django: соединение держится открытым долго,
+а синхронное представление заняло бы на это время целый поток.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 """
@@ -13,4 +17,12 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yanews.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from news.events import EVENTS_PATH, comment_events  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and EVENTS_PATH.match(scope['path']):
+        return await comment_events(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -0,0 +1,98 @@
+import asyncio
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PRIMARY = DEFAULT_DB_ALIAS
+# Кука «читать с основной базы», пока реплики догоняют запись.
+PRIMARY_COOKIE = 'use_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+use_primary = ContextVar('use_primary', default=False)
+
+
+@contextmanager
+def primary():
+    """Внутри блока все чтения идут в основную базу."""
+    token = use_primary.set(True)
+    try:
+        yield
+    finally:
+        use_primary.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Запись — в основную базу, чтение — в случайную реплику.
+
+    Реплики перечислены в настройке DATABASE_REPLICAS; без них,
+    а также внутри primary() чтение тоже идёт в основную базу.
+    """
+
+    def db_for_read(self, model, **hints):
+        if use_primary.get() or not settings.DATABASE_REPLICAS:
+            return PRIMARY
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """Реплики — копии основной базы, связи между ними допустимы."""
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        """Схема меняется только в основной базе, реплики её копируют."""
+        return db not in settings.DATABASE_REPLICAS
+
+
+class PrimaryAfterWriteMiddleware:
+    """
+    Читать свои записи: после изменяющего запроса пользователь
+    REPLICA_LAG секунд читает из основной базы.
+
+    Так редирект после нового комментария показывает этот
+    комментарий, даже если реплика ещё его не получила.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Под ASGI Django вызывает middleware как корутину; без
+            # этой отметки он выполнял бы всю цепочку под ним в одном
+            # общем потоке, как делает MiddlewareMixin.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        writes = request.method not in SAFE_METHODS
+        if not (writes or PRIMARY_COOKIE in request.COOKIES):
+            return self.get_response(request)
+        with primary():
+            response = self.get_response(request)
+        return self.remember_write(request, response)
+
+    async def __acall__(self, request):
+        writes = request.method not in SAFE_METHODS
+        if not (writes or PRIMARY_COOKIE in request.COOKIES):
+            return await self.get_response(request)
+        with primary():
+            response = await self.get_response(request)
+        return self.remember_write(request, response)
+
+    def remember_write(self, request, response):
+        if request.method not in SAFE_METHODS:
+            response.set_cookie(
+                PRIMARY_COOKIE, '1',
+                max_age=settings.REPLICA_LAG,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
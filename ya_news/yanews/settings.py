@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 from django.urls import reverse_lazy
@@ -21,6 +22,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'yanews.db_router.PrimaryAfterWriteMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -51,10 +53,75 @@ TEMPLATES = [
 WSGI_APPLICATION = 'yanews.wsgi.application'
 
 
-DATABASES = {
+# База данных настраивается переменными окружения. По умолчанию это
+# SQLite в режиме WAL: чтение не ждёт записи, а пишущие транзакции
+# встают в очередь на busy_timeout вместо ошибки «database is locked».
+DB_CONN_MAX_AGE = int(os.environ.get('DJANGO_DB_CONN_MAX_AGE', 60))
+
+if os.environ.get('DJANGO_DB_ENGINE') == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DJANGO_DB_NAME', 'yanews'),
+            'USER': os.environ.get('DJANGO_DB_USER', ''),
+            'PASSWORD': os.environ.get('DJANGO_DB_PASSWORD', ''),
+            'HOST': os.environ.get('DJANGO_DB_HOST', ''),
+            'PORT': os.environ.get('DJANGO_DB_PORT', ''),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            # Пул соединений держит PgBouncer; в режиме transaction
+            # он не поддерживает серверные курсоры.
+            'DISABLE_SERVER_SIDE_CURSORS': bool(
+                os.environ.get('DJANGO_DB_PGBOUNCER')
+            ),
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'yanews.db_backends.sqlite3',
+            'NAME': os.environ.get('DJANGO_DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'OPTIONS': {
+                'transaction_mode': 'IMMEDIATE',
+                'pragmas': {
+                    'journal_mode': 'WAL',
+                    'synchronous': 'NORMAL',
+                    'mmap_size': 256 * 1024 * 1024,
+                    'busy_timeout': int(
+                        os.environ.get('DJANGO_DB_BUSY_TIMEOUT', 5000)
+                    ),
+                },
+            },
+        }
+    }
+
+# Реплики только для чтения через запятую: файлы SQLite или хосты
+# PostgreSQL. В тестах реплики — зеркала основной базы.
+DATABASE_REPLICAS = []
+for index, replica in enumerate(
+    filter(None, os.environ.get('DJANGO_DB_REPLICAS', '').split(',')), 1
+):
+    alias = f'replica{index}'
+    location = 'HOST' if 'HOST' in DATABASES['default'] else 'NAME'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        location: replica,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['yanews.db_router.ReplicaRouter']
+# Сколько секунд после записи пользователь читает из основной базы.
+REPLICA_LAG = 5
+
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': os.getenv(
+            'DJANGO_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': os.getenv('DJANGO_CACHE_LOCATION', ''),
     }
 }
 
@@ -80,3 +147,14 @@ LOGIN_URL = reverse_lazy('users:login')
 LOGIN_REDIRECT_URL = reverse_lazy('news:home')
 
 NEWS_COUNT_ON_HOME_PAGE = 10
+NEWS_PER_PAGE = 20
+NEWS_RANKING_SIZE = 100
+COMMENTS_PER_PAGE = 50
+SEARCH_RESULTS_PER_PAGE = 20
+
+NEWS_CACHE_ALIAS = 'default'
+NEWS_CACHE_TIMEOUT = 60 * 15
+NEWS_COMMENT_BROKER = os.environ.get(
+    'NEWS_COMMENT_BROKER', 'news.broker.InProcessBroker'
+)
+NEWS_EVENTS_HEARTBEAT = 15
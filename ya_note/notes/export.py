@@ -0,0 +1,59 @@
+import json
+import zipfile
+
+JSONL, ZIP = 'jsonl', 'zip'
+FIELDS = ('id', 'title', 'text', 'slug')
+
+
+class ZipStream:
+    """
+    Поток без перемотки, из которого забирают уже записанные байты.
+
+    Без seek и tell ZipFile пишет размеры файлов после их данных,
+    поэтому архив можно отдавать клиенту по частям, не собирая
+    его целиком ни в памяти, ни на диске.
+    """
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self.parts)
+        self.parts.clear()
+        return data
+
+
+def read_notes(queryset, chunk_size):
+    """Заметки по возрастанию id; база читается курсором пачками."""
+    return queryset.order_by('id').values(*FIELDS).iterator(
+        chunk_size=chunk_size
+    )
+
+
+def export_jsonl(queryset, chunk_size):
+    """Заметки в JSON Lines, по строке на заметку."""
+    for note in read_notes(queryset, chunk_size):
+        yield (json.dumps(note, ensure_ascii=False) + '\n').encode()
+
+
+def to_markdown(note):
+    return f'# {note["title"]}\n\n{note["text"]}\n'
+
+
+def export_zip(queryset, chunk_size):
+    """Zip-архив с заметкой в Markdown на файл; имя файла — slug."""
+    stream = ZipStream()
+    with zipfile.ZipFile(stream, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for note in read_notes(queryset, chunk_size):
+            archive.writestr(f'{note["slug"]}.md', to_markdown(note))
+            data = stream.pop()
+            if data:
+                yield data
+    yield stream.pop()
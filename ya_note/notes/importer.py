@@ -0,0 +1,108 @@
+import csv
+import json
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import CommandError
+from django.core.validators import validate_slug
+
+from .models import Note
+
+JSONL, CSV = 'jsonl', 'csv'
+FORMATS = (JSONL, CSV)
+
+
+def guess_format(path):
+    return CSV if path.endswith('.csv') else JSONL
+
+
+def read_rows(stream, file_format):
+    """
+    Номера строк файла и словари заметок из них.
+
+    Файл разбирается построчно; строка, которая не разбирается,
+    останавливает загрузку с её номером.
+    """
+    if file_format == CSV:
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            raise CommandError(f'Строка {number}: некорректный JSON.')
+        yield number, row
+
+
+def check_row(number, row):
+    """Заголовок и текст — обязательные строки, slug — строка или пусто."""
+    if not isinstance(row, dict):
+        raise CommandError(f'Строка {number}: ожидался объект заметки.')
+    for name in ('title', 'text'):
+        if not isinstance(row.get(name), str):
+            raise CommandError(f'Строка {number}: нет строки {name}.')
+    if not isinstance(row.get('slug') or '', str):
+        raise CommandError(f'Строка {number}: slug должен быть строкой.')
+
+
+def build_notes(rows, author):
+    title_length = Note._meta.get_field('title').max_length
+    slug_length = Note._meta.get_field('slug').max_length
+    for number, row in rows:
+        check_row(number, row)
+        slug = row.get('slug') or ''
+        try:
+            validate_slug(slug)
+        except ValidationError:
+            slug = ''
+        yield Note(
+            title=row['title'][:title_length],
+            text=row['text'],
+            slug=slug if len(slug) <= slug_length else '',
+            author=author,
+        )
+
+
+def release_taken_slugs(notes):
+    """
+    Сбрасывает slug из файла, если он уже занят.
+
+    Занятые slug всей пачки выбираются одним запросом по уникальному
+    индексу; такие заметки, как и заметки без slug, получат
+    свободный slug из заголовка при вставке.
+    """
+    wanted = [note for note in notes if note.slug]
+    taken = set(
+        Note.objects.filter(
+            slug__in=[note.slug for note in wanted]
+        ).values_list('slug', flat=True)
+    ) if wanted else set()
+    for note in wanted:
+        if note.slug in taken:
+            note.slug = ''
+        else:
+            taken.add(note.slug)
+
+
+def import_notes(rows, author, batch_size):
+    """
+    Загружает заметки пачками, после каждой отдаёт её размер.
+
+    rows — номера строк и словари заметок, как из read_rows;
+    некорректная строка отклоняется до вставки своей пачки.
+    На пачку приходится запрос занятых slug из файла, запрос
+    занятых вариантов slug из заголовков и вставка; в памяти
+    держится только текущая пачка.
+    """
+    notes = build_notes(rows, author)
+    while True:
+        batch = list(islice(notes, batch_size))
+        if not batch:
+            return
+        release_taken_slugs(batch)
+        Note.objects.bulk_create(batch)
+        yield len(batch)
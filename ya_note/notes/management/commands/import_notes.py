@@ -0,0 +1,49 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from notes.importer import FORMATS, guess_format, import_notes, read_rows
+from notes.models import User
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает заметки пользователя из JSON Lines или CSV с полями '
+        'title, text и необязательным slug. Занятые и пустые slug '
+        'подбираются заново одним запросом на пачку.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл или «-» для stdin.')
+        parser.add_argument('--author', required=True, help='Имя автора.')
+        parser.add_argument('--format', choices=FORMATS)
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            author = User.objects.get(username=options['author'])
+        except User.DoesNotExist:
+            raise CommandError(f'Нет пользователя {options["author"]}.')
+        path = options['path']
+        file_format = options['format'] or guess_format(path)
+        if path == '-':
+            self.load(read_rows(sys.stdin, file_format), author, options)
+        else:
+            with open(path, encoding='utf-8', newline='') as stream:
+                self.load(read_rows(stream, file_format), author, options)
+
+    def load(self, rows, author, options):
+        started = time.perf_counter()
+        total = 0
+        for size in import_notes(rows, author, options['batch_size']):
+            total += size
+            if options['verbosity'] > 1:
+                self.stdout.write(f'Загружено {total}...')
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'Загружено заметок: {total} за {elapsed:.1f} с '
+            f'({total / max(elapsed, 1e-9):.0f} заметок/с).'
+        )
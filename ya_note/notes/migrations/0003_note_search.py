@@ -0,0 +1,76 @@
+from django.db import migrations
+
+
+def normalized(column):
+    """Буква «ё» индексируется как «е», иначе «еж» не найдёт «ёж»."""
+    return f"replace(replace({column}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+FORWARD_SQL = (
+    """
+    CREATE VIRTUAL TABLE notes_note_fts USING fts5(
+        title, text,
+        content='notes_note', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER notes_note_fts_insert AFTER INSERT ON notes_note BEGIN
+        INSERT INTO notes_note_fts(rowid, title, text)
+        VALUES (new.id, {normalized('new.title')}, {normalized('new.text')});
+    END
+    """,
+    f"""
+    CREATE TRIGGER notes_note_fts_delete AFTER DELETE ON notes_note BEGIN
+        INSERT INTO notes_note_fts(notes_note_fts, rowid, title, text)
+        VALUES (
+            'delete', old.id, {normalized('old.title')}, {normalized('old.text')}
+        );
+    END
+    """,
+    f"""
+    CREATE TRIGGER notes_note_fts_update AFTER UPDATE OF title, text
+    ON notes_note BEGIN
+        INSERT INTO notes_note_fts(notes_note_fts, rowid, title, text)
+        VALUES (
+            'delete', old.id, {normalized('old.title')}, {normalized('old.text')}
+        );
+        INSERT INTO notes_note_fts(rowid, title, text)
+        VALUES (new.id, {normalized('new.title')}, {normalized('new.text')});
+    END
+    """,
+    f"""
+    INSERT INTO notes_note_fts(rowid, title, text)
+    SELECT id, {normalized('title')}, {normalized('text')} FROM notes_note
+    """,
+)
+
+BACKWARD_SQL = (
+    'DROP TRIGGER notes_note_fts_update',
+    'DROP TRIGGER notes_note_fts_delete',
+    'DROP TRIGGER notes_note_fts_insert',
+    'DROP TABLE notes_note_fts',
+)
+
+
+def run_sqlite(statements):
+    """Полнотекстовый индекс есть только у SQLite (FTS5)."""
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0002_note_author_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_sqlite(FORWARD_SQL), run_sqlite(BACKWARD_SQL)
+        ),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 3.2.15 on 2026-10-18 16:46
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def normalized(column):
+    """Буква «ё» индексируется как «е», как и в 0003_note_search."""
+    return f"replace(replace({column}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+# SQLite добавляет поле, пересоздавая таблицу notes_note, и вместе
+# со старой таблицей удаляет триггеры полнотекстового индекса.
+TRIGGERS_SQL = (
+    'DROP TRIGGER IF EXISTS notes_note_fts_insert',
+    'DROP TRIGGER IF EXISTS notes_note_fts_delete',
+    'DROP TRIGGER IF EXISTS notes_note_fts_update',
+    f"""
+    CREATE TRIGGER notes_note_fts_insert AFTER INSERT ON notes_note BEGIN
+        INSERT INTO notes_note_fts(rowid, title, text)
+        VALUES (new.id, {normalized('new.title')}, {normalized('new.text')});
+    END
+    """,
+    f"""
+    CREATE TRIGGER notes_note_fts_delete AFTER DELETE ON notes_note BEGIN
+        INSERT INTO notes_note_fts(notes_note_fts, rowid, title, text)
+        VALUES (
+            'delete', old.id, {normalized('old.title')}, {normalized('old.text')}
+        );
+    END
+    """,
+    f"""
+    CREATE TRIGGER notes_note_fts_update AFTER UPDATE OF title, text
+    ON notes_note BEGIN
+        INSERT INTO notes_note_fts(notes_note_fts, rowid, title, text)
+        VALUES (
+            'delete', old.id, {normalized('old.title')}, {normalized('old.text')}
+        );
+        INSERT INTO notes_note_fts(rowid, title, text)
+        VALUES (new.id, {normalized('new.title')}, {normalized('new.text')});
+    END
+    """,
+)
+
+
+def restore_triggers(apps, schema_editor):
+    """Полнотекстовый индекс есть только у SQLite (FTS5)."""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in TRIGGERS_SQL:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('notes', '0003_note_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, restore_triggers),
+        migrations.CreateModel(
+            name='NoteTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('note_id', models.PositiveIntegerField(verbose_name='Id заметки')),
+                ('deleted', models.DateTimeField(auto_now_add=True, verbose_name='Удалена')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, verbose_name='Изменена'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['author', 'updated', 'id'], name='note_author_updated_idx'),
+        ),
+        migrations.AddField(
+            model_name='notetombstone',
+            name='author',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='notetombstone',
+            index=models.Index(fields=['author', 'deleted', 'note_id'], name='tombstone_author_deleted_idx'),
+        ),
+        migrations.RunPython(restore_triggers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.15 on 2026-10-18 17:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0004_note_changes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notetombstone',
+            name='note_id',
+            field=models.PositiveBigIntegerField(verbose_name='Id заметки'),
+        ),
+    ]
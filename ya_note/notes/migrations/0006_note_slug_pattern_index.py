@@ -0,0 +1,34 @@
+from django.db import migrations
+
+FORWARD_SQL = (
+    'CREATE INDEX notes_note_slug_pattern_idx '
+    'ON notes_note (slug varchar_pattern_ops)'
+)
+BACKWARD_SQL = 'DROP INDEX notes_note_slug_pattern_idx'
+
+
+def run_postgresql(statement):
+    """
+    Индекс для LIKE по началу slug нужен только PostgreSQL.
+
+    Уникальный индекс slug там сравнивает строки по правилам локали
+    и для LIKE не годится; SQLite ищет варианты slug диапазонами
+    по уникальному индексу.
+    """
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0005_note_tombstone_bigint'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_postgresql(FORWARD_SQL), run_postgresql(BACKWARD_SQL)
+        ),
+    ]
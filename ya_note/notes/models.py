@@ -1,12 +1,59 @@
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.utils import timezone
 
-from pytils.translit import slugify
+from .slugs import SLUG_ATTEMPTS, allocate_slugs
 
 User = get_user_model()
 
 
+class NoteQuerySet(models.QuerySet):
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """
+        Заметкам без slug подбирает свободные slug одним запросом,
+        не повторяя slug, заданные другим заметкам пачки.
+
+        Если параллельная вставка заняла подобранный slug,
+        пачка откатывается и slug подбираются заново.
+        """
+        objs = list(objs)
+        generated = [note for note in objs if not note.slug]
+        reserved = {note.slug for note in objs if note.slug}
+        for attempt in range(SLUG_ATTEMPTS):
+            allocate_slugs(generated, reserved)
+            try:
+                with transaction.atomic(using=self.db):
+                    return super().bulk_create(objs, *args, **kwargs)
+            except IntegrityError:
+                slugs = [note.slug for note in generated]
+                if (
+                    attempt == SLUG_ATTEMPTS - 1
+                    or not self.filter(slug__in=slugs).exists()
+                ):
+                    raise
+                for note in generated:
+                    note.slug = ''
+
+    def update(self, **kwargs):
+        """Отмечает время изменения, в том числе для bulk_update."""
+        kwargs.setdefault('updated', timezone.now())
+        return super().update(**kwargs)
+
+    def delete(self):
+        """Оставляет надгробия удалённых заметок для синхронизации."""
+        with transaction.atomic(using=self.db):
+            NoteTombstone.objects.using(self.db).bulk_create(
+                NoteTombstone(note_id=note_id, author_id=author_id)
+                for note_id, author_id in self.values_list('id', 'author_id')
+            )
+            return super().delete()
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
 class Note(models.Model):
     title = models.CharField(
         'Заголовок',
@@ -29,13 +76,73 @@ class Note(models.Model):
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
+        db_index=False,
     )
+    updated = models.DateTimeField('Изменена', auto_now=True)
+
+    objects = NoteQuerySet.as_manager()
+
+    class Meta:
+        indexes = (
+            models.Index(fields=('author', 'id'), name='note_author_idx'),
+            models.Index(
+                fields=('author', 'updated', 'id'),
+                name='note_author_updated_idx',
+            ),
+        )
 
     def __str__(self):
         return self.title
 
     def save(self, *args, **kwargs):
-        if not self.slug:
-            max_slug_length = self._meta.get_field('slug').max_length
-            self.slug = slugify(self.title)[:max_slug_length]
-        super().save(*args, **kwargs)
+        """
+        Без slug подбирает свободный: заголовок, заголовок-2 и так далее.
+
+        Если параллельный запрос успел занять тот же slug,
+        подбирает его заново.
+        """
+        if self.slug:
+            return super().save(*args, **kwargs)
+        for attempt in range(SLUG_ATTEMPTS):
+            allocate_slugs([self])
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                if (
+                    attempt == SLUG_ATTEMPTS - 1
+                    or not Note.objects.filter(slug=self.slug).exists()
+                ):
+                    raise
+                self.slug = ''
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            NoteTombstone.objects.create(
+                note_id=self.pk, author_id=self.author_id
+            )
+            return super().delete(*args, **kwargs)
+
+
+class NoteTombstone(models.Model):
+    """
+    След удалённой заметки.
+
+    По надгробиям клиенты узнают, какие заметки удалить у себя.
+    Id заметок SQLite не переиспользует, поэтому note_id однозначен.
+    """
+    note_id = models.PositiveBigIntegerField('Id заметки')
+    author = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_index=False,
+    )
+    deleted = models.DateTimeField('Удалена', auto_now_add=True)
+
+    class Meta:
+        indexes = (
+            models.Index(
+                fields=('author', 'deleted', 'note_id'),
+                name='tombstone_author_deleted_idx',
+            ),
+        )
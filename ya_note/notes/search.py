@@ -0,0 +1,58 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+WORD = re.compile(r'\w+')
+# Самые частые окончания русских слов: без них запрос «заметки»
+# превращается в префикс «заметк*» и находит все формы слова.
+RUSSIAN_ENDING = re.compile(
+    r'(ами|ями|ого|его|ому|ему|ыми|ими|ой|ей|ий|ый|ая|яя|ое|ее|ые|ие'
+    r'|ам|ям|ах|ях|ом|ем|ов|ев|а|я|о|е|ы|и|у|ю|ь)$'
+)
+MIN_STEM_LENGTH = 3
+# Совпадение в заголовке весит больше, чем в тексте.
+RANK = 'bm25(notes_note_fts, 10.0, 1.0)'
+
+
+def stem(word):
+    """Отрезает окончание у русского слова, оставляя хотя бы три буквы."""
+    word = word.lower().replace('ё', 'е')
+    stemmed = RUSSIAN_ENDING.sub('', word)
+    return stemmed if len(stemmed) >= MIN_STEM_LENGTH else word
+
+
+def build_match_query(text):
+    """
+    Превращает пользовательский ввод в запрос FTS5.
+
+    Каждое слово берётся в кавычки (синтаксис FTS5 в запросе не
+    работает) и ищется по префиксу; все слова должны встретиться.
+    """
+    return ' '.join(f'"{stem(word)}"*' for word in WORD.findall(text))
+
+
+def search_notes(queryset, text):
+    """
+    Заметки из queryset, подходящие под запрос, от лучших к худшим.
+
+    На SQLite поиск идёт по индексу FTS5, который триггеры держат
+    в актуальном состоянии; на других базах — простым icontains.
+    """
+    match_query = build_match_query(text)
+    if not match_query:
+        return queryset.none()
+    if connection.vendor != 'sqlite':
+        return queryset.filter(
+            Q(title__icontains=text) | Q(text__icontains=text)
+        )
+    return queryset.extra(
+        tables=('notes_note_fts',),
+        where=(
+            'notes_note_fts.rowid = notes_note.id',
+            'notes_note_fts MATCH %s',
+        ),
+        params=(match_query,),
+        select={'rank': RANK},
+        order_by=('rank',),
+    )
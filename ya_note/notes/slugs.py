@@ -0,0 +1,166 @@
+import re
+from functools import lru_cache
+from itertools import count
+
+from django.db import connection
+from django.db.models import Q
+from pytils import translit
+
+# Slug для заголовков, в которых не осталось ни одной буквы или цифры.
+FALLBACK_SLUG = 'note'
+# Место под самый длинный суффикс вида «-99999999999».
+SUFFIX_RESERVE = 12
+# Сколько раз подбирать slug заново, если его успел занять другой запрос.
+SLUG_ATTEMPTS = 5
+# Сколько разных заголовков помнит кэш транслитерации.
+SLUGIFY_CACHE_SIZE = 4096
+# Сколько диапазонов slug проверяет один запрос: SQLite разбирает
+# OR цепочкой и отклоняет выражения глубже 1000 уровней.
+SLUG_LOOKUP_CHUNK = 200
+
+# Те же шаги, что в pytils.translit.slugify, но только для ASCII:
+# латиница переводится сама в себя, и таблица транслитерации не нужна.
+AMPERSAND = re.compile(r'&amp;|&')
+SEPARATORS = re.compile(r'[-\s]+')
+NON_WORD = re.compile(r'[^\w\s-]')
+ASCII_ALPHABET = frozenset(
+    symbol for symbol in translit.ALPHABET
+    if len(symbol) == 1 and symbol.isascii()
+)
+
+
+def ascii_slugify(title):
+    text = SEPARATORS.sub('-', AMPERSAND.sub(' and ', title.lower()))
+    text = ''.join(symbol for symbol in text if symbol in ASCII_ALPHABET)
+    return NON_WORD.sub('', text).strip().lower()
+
+
+@lru_cache(maxsize=SLUGIFY_CACHE_SIZE)
+def slugify(title):
+    """
+    Результат pytils.translit.slugify, но дешевле.
+
+    Повторяющиеся заголовки берутся из кэша, а заголовки
+    без кириллицы обходятся без таблицы транслитерации.
+    """
+    if title.isascii():
+        return ascii_slugify(title)
+    return translit.slugify(title)
+
+
+def make_slug(title, max_length):
+    return slugify(title)[:max_length] or FALLBACK_SLUG
+
+
+def numbered_slug(base, number, max_length):
+    """Вариант slug с номером: base, base-2, base-3..."""
+    if number == 1:
+        return base
+    suffix = f'-{number}'
+    return base[:max_length - len(suffix)] + suffix
+
+
+def candidates_root(base, max_length):
+    """Общее начало base и всех его вариантов с номерами."""
+    if len(base) > max_length - SUFFIX_RESERVE:
+        return base[:max_length - SUFFIX_RESERVE]
+    return base
+
+
+def candidates_range(base, max_length):
+    """
+    Границы диапазона, в который попадают все варианты slug с номерами.
+
+    Это диапазон по уникальному индексу slug, а не LIKE, поэтому
+    поиск занятых вариантов читает из индекса только их. Границы
+    верны только при побайтовом сравнении строк, как в SQLite.
+    """
+    root = candidates_root(base, max_length)
+    if root != base:
+        return root, root + '\x7f'
+    # После дефиса в суффиксе идут только цифры: все они меньше «:».
+    # Символов меньше «-» в slug не бывает, поэтому один диапазон
+    # захватывает и сам base, и все его варианты с номерами.
+    return base, base + '-:'
+
+
+def any_of(conditions):
+    """
+    Условия, соединённые через OR, деревом пополам.
+
+    Добавляя условие в WHERE, Django сравнивает его со всеми уже
+    добавленными на том же уровне. Плоский OR из сотен условий
+    поэтому собирается квадратично, а дерево — почти линейно:
+    на каждом уровне у узла по два условия.
+    """
+    if len(conditions) == 1:
+        return conditions[0]
+    middle = len(conditions) // 2
+    return Q(
+        any_of(conditions[:middle]),
+        any_of(conditions[middle:]),
+        _connector=Q.OR,
+    )
+
+
+def candidates_lookup(bases, max_length):
+    """
+    Условие на варианты slug всех base пачки.
+
+    Правила сравнения строк PostgreSQL и других баз зависят от локали
+    и могут пропускать знаки препинания, поэтому там вместо диапазонов
+    берётся LIKE по началу slug (для него есть индекс с
+    varchar_pattern_ops).
+    """
+    if connection.vendor != 'sqlite':
+        return any_of([
+            Q(slug__startswith=candidates_root(base, max_length))
+            for base in bases
+        ])
+    return any_of([
+        Q(slug__gte=low, slug__lt=high)
+        for low, high in (
+            candidates_range(base, max_length) for base in bases
+        )
+    ])
+
+
+def allocate_slugs(notes, reserved=()):
+    """
+    Проставляет свободные slug заметкам, у которых slug не указан.
+
+    Занятые варианты для всей пачки выбираются одним запросом
+    на SLUG_LOOKUP_CHUNK разных заголовков, поэтому метод подходит
+    и для одной заметки, и для bulk_create.
+    В reserved — slug, которые ещё не в базе, но уже отданы другим
+    заметкам той же пачки.
+    """
+    pending = [note for note in notes if not note.slug]
+    if not pending:
+        return
+    model = type(pending[0])
+    max_length = model._meta.get_field('slug').max_length
+    groups = {}
+    for note in pending:
+        groups.setdefault(
+            make_slug(note.title, max_length), []
+        ).append(note)
+    bases = list(groups)
+    pending_pks = [note.pk for note in pending if note.pk]
+    taken = set(reserved)
+    for start in range(0, len(bases), SLUG_LOOKUP_CHUNK):
+        taken.update(
+            model._default_manager.filter(
+                candidates_lookup(
+                    bases[start:start + SLUG_LOOKUP_CHUNK], max_length
+                )
+            ).exclude(pk__in=pending_pks).values_list('slug', flat=True)
+        )
+    for base, group in groups.items():
+        numbers = count(1)
+        for note in group:
+            slug = numbered_slug(base, next(numbers), max_length)
+            while slug in taken:
+                slug = numbered_slug(base, next(numbers), max_length)
+            note.slug = slug
+            taken.add(slug)
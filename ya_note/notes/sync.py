@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.db.models import Q
+from django.http import Http404
+from django.utils import timezone as django_timezone
+
+from .models import Note, NoteTombstone
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+# Целые за пределами BIGINT база не принимает: SQLite отвечает
+# на них OverflowError, а не пустой выборкой.
+MAX_INT = 2 ** 63 - 1
+
+
+def parse_int(value):
+    """Целое из запроса в пределах BIGINT, иначе ValueError."""
+    number = int(value)
+    if abs(number) > MAX_INT:
+        raise ValueError('Число вне диапазона.')
+    return number
+
+
+def encode_cursor(moment, note_id):
+    return f'{(moment - EPOCH) // MICROSECOND}-{note_id}'
+
+
+def decode_cursor(cursor):
+    try:
+        micros, note_id = (parse_int(part) for part in cursor.split('-'))
+        return EPOCH + micros * MICROSECOND, note_id
+    except (ValueError, OverflowError):
+        raise Http404('Некорректный курсор.')
+
+
+def after(field, moment, note_id, id_field):
+    """Условие «позже курсора» по составному ключу (время, id)."""
+    return Q(**{f'{field}__gt': moment}) | Q(
+        **{field: moment, f'{id_field}__gt': note_id}
+    )
+
+
+def get_changes(user, cursor, limit):
+    """
+    Изменения заметок пользователя после курсора.
+
+    Заметки и надгробия читаются по индексам (автор, время, id),
+    поэтому запрос читает только изменения, а не все заметки.
+    Возвращает изменённые заметки, id удалённых, новый курсор
+    и признак того, что изменений больше, чем limit.
+
+    Изменения за последние NOTES_SYNC_WINDOW секунд не отдаются:
+    запись, ждущая блокировки, ещё может зафиксироваться со временем
+    раньше курсора, и клиент её бы пропустил.
+    """
+    horizon = django_timezone.now() - timedelta(
+        seconds=settings.NOTES_SYNC_WINDOW
+    )
+    notes = Note.objects.filter(
+        author=user, updated__lte=horizon
+    ).order_by('updated', 'id')
+    tombstones = NoteTombstone.objects.filter(
+        author=user, deleted__lte=horizon
+    ).order_by('deleted', 'note_id')
+    if cursor:
+        moment, note_id = decode_cursor(cursor)
+        notes = notes.filter(after('updated', moment, note_id, 'id'))
+        tombstones = tombstones.filter(
+            after('deleted', moment, note_id, 'note_id')
+        )
+    changes = sorted(
+        [(note.updated, note.id, note) for note in notes[:limit + 1]]
+        + [
+            (deleted, note_id, None)
+            for deleted, note_id in tombstones.values_list(
+                'deleted', 'note_id'
+            )[:limit + 1]
+        ],
+        key=lambda change: change[:2],
+    )
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    if changes:
+        cursor = encode_cursor(*changes[-1][:2])
+    return (
+        [note for _, _, note in changes if note is not None],
+        [note_id for _, note_id, note in changes if note is None],
+        cursor,
+        has_more,
+    )
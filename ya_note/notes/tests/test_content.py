@@ -1,4 +1,11 @@
-from django.test import Client, TestCase
+import io
+import json
+import zipfile
+from http import HTTPStatus
+
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from notes.models import Note, User
@@ -58,3 +65,222 @@ class TestDetailNote(TestCase):
                 url = reverse(name, args=args)
                 response = self.author_client.get(url)
                 self.assertIn('form', response.context)
+
+
+@override_settings(NOTES_PER_PAGE=20)
+class TestNotesListPagination(TestCase):
+    NOTES_COUNT = 50
+    LONG_TEXT = 'Очень длинный текст заметки. ' * 100
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор')
+        Note.objects.bulk_create(
+            Note(
+                title=f'Заметка {index}',
+                text=cls.LONG_TEXT,
+                author=cls.author,
+                slug=f'note-{index}',
+            )
+            for index in range(cls.NOTES_COUNT)
+        )
+        cls.list_url = reverse('notes:list')
+
+    def setUp(self):
+        self.client.force_login(self.author)
+
+    def test_notes_list_paginated_by_cursor(self):
+        """
+        Список заметок выдаётся страницами: каждая читается
+        одним запросом к заметкам, вместе страницы содержат
+        все заметки по одному разу.
+        """
+        received = []
+        params = {}
+        while True:
+            # Сессия, пользователь и одна выборка заметок.
+            with self.assertNumQueries(3):
+                response = self.client.get(self.list_url, params)
+            page = response.context['object_list']
+            self.assertLessEqual(len(page), 20)
+            received.extend(note.slug for note in page)
+            next_cursor = response.context['next_cursor']
+            if next_cursor is None:
+                break
+            params = {'after': next_cursor}
+        self.assertEqual(
+            received, [f'note-{index}' for index in range(self.NOTES_COUNT)]
+        )
+
+    def test_notes_list_skips_text(self):
+        """Текст заметок для списка не загружается и не выводится."""
+        response = self.client.get(self.list_url)
+        for note in response.context['object_list']:
+            self.assertIn('text', note.get_deferred_fields())
+        self.assertNotIn(self.LONG_TEXT, response.content.decode())
+
+    def test_broken_cursor(self):
+        """
+        Испорченный курсор, в том числе больше BIGINT,
+        приводит к ошибке 404.
+        """
+        for cursor in ('сломан', str(2 ** 64)):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(self.list_url, {'after': cursor})
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_api_paginated_by_cursor(self):
+        """API отдаёт все заметки страницами по курсору."""
+        url = reverse('notes:api')
+        received = []
+        params = {}
+        while True:
+            with self.assertNumQueries(3):
+                data = self.client.get(url, params).json()
+            self.assertLessEqual(len(data['notes']), 20)
+            received.extend(note['slug'] for note in data['notes'])
+            if data['next'] is None:
+                break
+            params = {'after': data['next']}
+        self.assertEqual(
+            received, [f'note-{index}' for index in range(self.NOTES_COUNT)]
+        )
+
+
+class TestNoteSearch(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор')
+        cls.reader = User.objects.create(username='Читатель')
+        cls.title_match = Note.objects.create(
+            title='Ёжик в тумане', text='Мультфильм', author=cls.author
+        )
+        cls.text_match = Note.objects.create(
+            title='Список фильмов', text='Посмотреть про ежика',
+            author=cls.author,
+        )
+        Note.objects.create(
+            title='Ежики', text='Чужая заметка', author=cls.reader
+        )
+        cls.search_url = reverse('notes:search')
+
+    def setUp(self):
+        self.client.force_login(self.author)
+
+    def search(self, query):
+        response = self.client.get(self.search_url, {'q': query})
+        return list(response.context['object_list'])
+
+    def test_search_ranks_title_first_and_skips_other_users(self):
+        """
+        Находятся только свои заметки, совпадение в заголовке
+        выше совпадения в тексте, «ё» и «е» не различаются,
+        слово ищется в любой форме.
+        """
+        self.assertEqual(
+            self.search('ежики'), [self.title_match, self.text_match]
+        )
+
+    def test_search_by_prefix(self):
+        """Поиск работает по началу слова."""
+        self.assertEqual(self.search('мульт'), [self.title_match])
+
+    def test_search_index_follows_changes(self):
+        """Индекс поиска обновляется при изменении и удалении заметок."""
+        self.text_match.text = 'Посмотреть про слоника'
+        self.text_match.save()
+        self.title_match.delete()
+        self.assertEqual(self.search('ежик'), [])
+        self.assertEqual(self.search('слоник'), [self.text_match])
+
+    def test_search_syntax_is_escaped(self):
+        """Служебные символы FTS5 в запросе не ломают поиск."""
+        for query in ('"ежик', 'ежик OR NOT', 'ежик*)(', ''):
+            with self.subTest(query=query):
+                response = self.client.get(self.search_url, {'q': query})
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    @override_settings(NOTES_PER_PAGE=1)
+    def test_search_paginated(self):
+        """Результаты поиска разбиты на страницы."""
+        response = self.client.get(self.search_url, {'q': 'ежик', 'page': 2})
+        self.assertEqual(
+            list(response.context['object_list']), [self.text_match]
+        )
+        self.assertFalse(response.context['page_obj'].has_next())
+
+
+@override_settings(NOTES_EXPORT_CHUNK_SIZE=7)
+class TestNotesExport(TestCase):
+    NOTES_COUNT = 30
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор')
+        cls.reader = User.objects.create(username='Читатель')
+        Note.objects.bulk_create(
+            Note(
+                title=f'Заметка {index}',
+                text=f'Текст {index}',
+                author=cls.author,
+                slug=f'note-{index}',
+            )
+            for index in range(cls.NOTES_COUNT)
+        )
+        Note.objects.create(
+            title='Чужая', text='Текст', author=cls.reader, slug='other'
+        )
+        cls.url = reverse('notes:export')
+
+    def setUp(self):
+        self.client.force_login(self.author)
+
+    def export(self, file_format):
+        response = self.client.get(self.url, {'format': file_format})
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_export_jsonl(self):
+        """JSON Lines содержит все заметки автора и только их."""
+        notes = [
+            json.loads(line)
+            for line in self.export('jsonl').decode().splitlines()
+        ]
+        self.assertEqual(
+            [note['slug'] for note in notes],
+            [f'note-{index}' for index in range(self.NOTES_COUNT)],
+        )
+        self.assertEqual(notes[0]['text'], 'Текст 0')
+
+    def test_export_zip(self):
+        """Архив содержит по Markdown-файлу на каждую заметку автора."""
+        with zipfile.ZipFile(io.BytesIO(self.export('zip'))) as archive:
+            self.assertEqual(
+                archive.namelist(),
+                [f'note-{index}.md' for index in range(self.NOTES_COUNT)],
+            )
+            self.assertEqual(
+                archive.read('note-3.md').decode(),
+                '# Заметка 3\n\nТекст 3\n',
+            )
+
+    def test_export_is_lazy(self):
+        """
+        Заметки читаются из базы только при отправке ответа,
+        а не при его создании.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertFalse(
+            any('notes_note' in query['sql'] for query in queries)
+        )
+        self.assertEqual(
+            len(b''.join(response.streaming_content).splitlines()),
+            self.NOTES_COUNT,
+        )
+
+    def test_unknown_format(self):
+        """Неизвестный формат выгрузки приводит к ошибке 404."""
+        response = self.client.get(self.url, {'format': 'pdf'})
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
@@ -1,11 +1,24 @@
+import json
+import shutil
+import tempfile
+from datetime import timedelta
 from http import HTTPStatus
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-from django.test import Client, TestCase
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from pytils.translit import slugify
 
+from notes import slugs
 from notes.forms import WARNING
-from notes.models import Note, User
+from notes.models import Note, NoteTombstone, User
 
 
 class TestNoteCreation(TestCase):
@@ -139,3 +152,480 @@ class TestNoteEditDelete(TestCase):
         self.note.refresh_from_db()
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertEqual(self.note.text, self.TEXT)
+
+
+class TestSlugAllocation(TestCase):
+    TITLE = 'Заголовок'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='Username')
+        cls.auth_client = Client()
+        cls.auth_client.force_login(cls.user)
+        cls.base_slug = slugify(cls.TITLE)
+
+    def test_same_titles_get_numbered_slugs(self):
+        """
+        Заметки с одинаковым заголовком без slug
+        создаются с номерами, без ошибки формы.
+        """
+        for _ in range(3):
+            response = self.auth_client.post(
+                reverse('notes:add'), data={'title': self.TITLE, 'text': 'Т'}
+            )
+            self.assertRedirects(response, reverse('notes:success'))
+        self.assertQuerysetEqual(
+            Note.objects.order_by('id').values_list('slug', flat=True),
+            [self.base_slug, f'{self.base_slug}-2', f'{self.base_slug}-3'],
+        )
+
+    def test_bulk_create_allocates_slugs_in_one_query(self):
+        """Для пачки заметок занятые slug ищутся одним запросом."""
+        Note.objects.create(title=self.TITLE, text='Т', author=self.user)
+        notes = [
+            Note(title=title, text='Т', author=self.user)
+            for title in (self.TITLE, self.TITLE, 'Другой', '!!!')
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            Note.objects.bulk_create(notes)
+        selects = [
+            query for query in queries.captured_queries
+            if query['sql'].startswith('SELECT')
+        ]
+        self.assertEqual(len(selects), 1)
+        self.assertEqual(
+            [note.slug for note in notes],
+            [
+                f'{self.base_slug}-2',
+                f'{self.base_slug}-3',
+                slugify('Другой'),
+                slugs.FALLBACK_SLUG,
+            ],
+        )
+
+    def test_long_title_keeps_suffix(self):
+        """Номер не отрезается ограничением длины slug."""
+        title = 'а' * 100
+        first = Note.objects.create(title=title, text='Т', author=self.user)
+        second = Note.objects.create(title=title, text='Т', author=self.user)
+        self.assertEqual(len(first.slug), 100)
+        self.assertEqual(len(second.slug), 100)
+        self.assertTrue(second.slug.endswith('-2'))
+
+    def test_other_databases_match_slug_prefix(self):
+        """
+        Вне SQLite варианты slug ищутся по началу строки, а не
+        диапазоном, который зависит от правил сравнения строк.
+        """
+        for slug in (self.base_slug, f'{self.base_slug}-2'):
+            Note.objects.create(
+                title=self.TITLE, text='Т', author=self.user, slug=slug
+            )
+        with mock.patch('notes.slugs.connection') as other_database:
+            other_database.vendor = 'postgresql'
+            lookup = slugs.candidates_lookup([self.base_slug], 100)
+            note = Note.objects.create(
+                title=self.TITLE, text='Т', author=self.user
+            )
+        self.assertIn('slug__startswith', str(lookup))
+        self.assertEqual(note.slug, f'{self.base_slug}-3')
+
+    def test_slug_taken_concurrently_is_reallocated(self):
+        """
+        Если slug заняли между подбором и вставкой,
+        заметка сохраняется со следующим свободным slug.
+        """
+        Note.objects.create(title=self.TITLE, text='Т', author=self.user)
+        allocate_slugs = slugs.allocate_slugs
+
+        def stale_allocation(notes):
+            # Первая попытка видит базу до параллельной вставки.
+            if allocate.call_count == 1:
+                notes[0].slug = self.base_slug
+            else:
+                allocate_slugs(notes)
+
+        with mock.patch(
+            'notes.models.allocate_slugs', side_effect=stale_allocation
+        ) as allocate:
+            note = Note.objects.create(
+                title=self.TITLE, text='Т', author=self.user
+            )
+        self.assertEqual(allocate.call_count, 2)
+        self.assertEqual(note.slug, f'{self.base_slug}-2')
+
+
+class TestImportNotes(TestCase):
+    TITLE = 'Заголовок'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='Username')
+        Note.objects.create(
+            title='Старая', text='Т', author=cls.user, slug='taken'
+        )
+        cls.base_slug = slugify(cls.TITLE)
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.directory = Path(directory)
+
+    def import_notes(self, name, content, *args):
+        path = self.directory / name
+        path.write_text(content, encoding='utf-8')
+        output = StringIO()
+        call_command(
+            'import_notes', str(path), '--author', self.user.username,
+            *args, stdout=output,
+        )
+        return output.getvalue()
+
+    def test_import_resolves_slugs(self):
+        """
+        Свободный slug из файла сохраняется; занятый, повторный,
+        некорректный и пустой подбираются из заголовка с номером.
+        """
+        rows = [
+            {'title': self.TITLE, 'text': 'Т', 'slug': 'free'},
+            {'title': self.TITLE, 'text': 'Т', 'slug': 'taken'},
+            {'title': self.TITLE, 'text': 'Т', 'slug': 'free'},
+            {'title': self.TITLE, 'text': 'Т', 'slug': 'не slug'},
+            {'title': self.TITLE, 'text': 'Т'},
+        ]
+        output = self.import_notes(
+            'notes.jsonl', ''.join(json.dumps(row) + '\n' for row in rows)
+        )
+        self.assertQuerysetEqual(
+            Note.objects.exclude(slug='taken').order_by('id').values_list(
+                'slug', flat=True
+            ),
+            ['free', self.base_slug]
+            + [f'{self.base_slug}-{number}' for number in range(2, 5)],
+        )
+        self.assertIn('Загружено заметок: 5', output)
+
+    def test_generated_slug_skips_file_slug_of_same_batch(self):
+        """
+        Slug из заголовка не совпадает со slug из файла, который
+        в той же пачке получила другая заметка.
+        """
+        rows = [
+            {'title': 'A', 'text': 'Т', 'slug': 'hello'},
+            {'title': 'Hello', 'text': 'Т'},
+        ]
+        self.import_notes(
+            'notes.jsonl', ''.join(json.dumps(row) + '\n' for row in rows)
+        )
+        self.assertQuerysetEqual(
+            Note.objects.exclude(slug='taken').order_by('id').values_list(
+                'slug', flat=True
+            ),
+            ['hello', 'hello-2'],
+        )
+
+    def test_import_queries_per_batch(self):
+        """
+        На пачку приходится постоянное число запросов,
+        сколько бы заметок в ней ни было.
+        """
+        content = 'title,text,slug\n' + ''.join(
+            f'{self.TITLE},Текст {index},note-{index}\n'
+            f'{self.TITLE},Текст {index},\n'
+            for index in range(10)
+        )
+        # Автор; на каждую из двух пачек: занятые slug из файла,
+        # занятые варианты slug из заголовков, точка сохранения,
+        # вставка и освобождение точки сохранения.
+        with self.assertNumQueries(11):
+            self.import_notes('notes.csv', content, '--batch-size', '10')
+        self.assertEqual(
+            Note.objects.filter(text__startswith='Текст').count(), 20
+        )
+
+    def test_full_batch_of_distinct_titles(self):
+        """
+        Пачка размера по умолчанию с разными заголовками загружается:
+        занятые варианты slug ищутся несколькими запросами.
+        """
+        count = slugs.SLUG_LOOKUP_CHUNK * 5
+        output = self.import_notes('notes.jsonl', ''.join(
+            json.dumps({'title': f'Заметка {index}', 'text': 'Т'}) + '\n'
+            for index in range(count)
+        ))
+        self.assertIn(f'Загружено заметок: {count}', output)
+        self.assertEqual(
+            Note.objects.filter(title__startswith='Заметка ').count(), count
+        )
+
+    def test_broken_rows_rejected_with_line_number(self):
+        """
+        Строка без заголовка или текста, со значением не строкой или
+        с испорченным JSON останавливает загрузку с номером строки.
+        """
+        good = json.dumps({'title': 'Т', 'text': 'Т'})
+        cases = (
+            ('notes.jsonl', json.dumps({'title': 'Т'}), 'Строка 3'),
+            ('notes.jsonl', json.dumps({'title': 1, 'text': 'Т'}), 'Строка 3'),
+            ('notes.jsonl', json.dumps(['Т', 'Т']), 'Строка 3'),
+            ('notes.jsonl', '{"title": ', 'Строка 3'),
+            ('notes.csv', 'Т', 'Строка 4'),
+        )
+        for name, broken, message in cases:
+            with self.subTest(broken=broken):
+                if name.endswith('.csv'):
+                    content = f'title,text\nТ,Т\nТ,Т\n{broken}\n'
+                else:
+                    content = f'{good}\n\n{broken}\n'
+                with self.assertRaisesMessage(CommandError, message):
+                    self.import_notes(name, content, '--batch-size', '1')
+
+    def test_unknown_author(self):
+        """Импорт для несуществующего автора завершается ошибкой."""
+        with self.assertRaises(CommandError):
+            call_command('import_notes', '-', '--author', 'Никто')
+
+
+class TestNotesApiBatch(TestCase):
+    BATCH_SIZE = 50
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор')
+        cls.reader = User.objects.create(username='Читатель')
+        Note.objects.bulk_create(
+            Note(
+                title=f'Заметка {index}',
+                text='Текст',
+                author=cls.author,
+                slug=f'note-{index}',
+            )
+            for index in range(cls.BATCH_SIZE * 2)
+        )
+        cls.foreign_note = Note.objects.create(
+            title='Чужая', text='Текст', author=cls.reader, slug='foreign'
+        )
+        cls.url = reverse('notes:api')
+
+    def setUp(self):
+        self.client.force_login(self.author)
+
+    def post(self, batch):
+        return self.client.post(
+            self.url, json.dumps(batch), content_type='application/json'
+        )
+
+    def test_batch_runs_constant_number_of_queries(self):
+        """
+        Пакет из создания, изменения и удаления заметок выполняется
+        числом запросов, не зависящим от размера пакета.
+        """
+        notes = list(
+            Note.objects.filter(author=self.author).order_by('id')
+        )
+        batch = {
+            'create': [
+                {'title': 'Новая заметка', 'text': 'Текст', 'slug': ''}
+                for _ in range(self.BATCH_SIZE)
+            ],
+            'update': [
+                {
+                    'id': note.id,
+                    'title': note.title,
+                    'text': 'Новый текст',
+                    'slug': note.slug,
+                }
+                for note in notes[:self.BATCH_SIZE]
+            ],
+            'delete': [note.id for note in notes[self.BATCH_SIZE:]],
+        }
+        # Сессия, пользователь, изменяемые заметки, проверка slug,
+        # затем в транзакции: удаляемые заметки, надгробия, DELETE,
+        # UPDATE, подбор slug и INSERT (и три пары точек сохранения).
+        with self.assertNumQueries(16):
+            response = self.post(batch)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        data = response.json()
+        self.assertEqual(data['deleted'], self.BATCH_SIZE)
+        self.assertEqual(
+            data['created'],
+            ['novaya-zametka'] + [
+                f'novaya-zametka-{number}'
+                for number in range(2, self.BATCH_SIZE + 1)
+            ],
+        )
+        self.assertEqual(
+            Note.objects.filter(text='Новый текст').count(), self.BATCH_SIZE
+        )
+
+    def test_full_batch_of_distinct_titles(self):
+        """Пакет предельного размера с разными заголовками сохраняется."""
+        response = self.post({'create': [
+            {'title': f'Новая заметка {index}', 'text': 'Т', 'slug': ''}
+            for index in range(settings.NOTES_API_BATCH_SIZE)
+        ]})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(
+            len(set(response.json()['created'])),
+            settings.NOTES_API_BATCH_SIZE,
+        )
+        self.assertEqual(
+            Note.objects.filter(title__startswith='Новая заметка ').count(),
+            settings.NOTES_API_BATCH_SIZE,
+        )
+
+    def test_taken_slug_rejects_whole_batch(self):
+        """Занятый slug отклоняет пакет целиком, ничего не меняя."""
+        notes_count = Note.objects.count()
+        response = self.post({
+            'create': [
+                {'title': 'Первая', 'text': 'Текст', 'slug': 'free'},
+                {'title': 'Вторая', 'text': 'Текст', 'slug': 'foreign'},
+            ],
+            'delete': [Note.objects.filter(author=self.author)[0].id],
+        })
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertEqual(
+            response.json()['errors'], {'foreign': 'foreign' + WARNING}
+        )
+        self.assertEqual(Note.objects.count(), notes_count)
+
+    def test_cant_change_notes_of_another_user(self):
+        """Чужие заметки через API не изменяются и не удаляются."""
+        response = self.post({
+            'update': [{
+                'id': self.foreign_note.id,
+                'title': 'Взлом',
+                'text': 'Текст',
+                'slug': 'foreign',
+            }],
+        })
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        response = self.post({'delete': [self.foreign_note.id]})
+        self.assertEqual(response.json()['deleted'], 0)
+        self.foreign_note.refresh_from_db()
+        self.assertEqual(self.foreign_note.title, 'Чужая')
+
+    def test_bad_ids_rejected(self):
+        """
+        Id не целым числом или больше BIGINT приводят к ошибке 400,
+        а не к ошибке сервера.
+        """
+        for bad_id in ([1], {'a': 1}, '1', True, 2 ** 64):
+            with self.subTest(bad_id=bad_id):
+                response = self.post({'update': [{
+                    'id': bad_id, 'title': 'Т', 'text': 'Т', 'slug': 'new'
+                }]})
+                self.assertEqual(
+                    response.status_code, HTTPStatus.BAD_REQUEST
+                )
+                self.assertEqual(
+                    response.json()['errors'], {'update.0': 'Некорректный id.'}
+                )
+                response = self.post({'delete': [bad_id]})
+                self.assertEqual(
+                    response.status_code, HTTPStatus.BAD_REQUEST
+                )
+        response = self.client.get(self.url, {'after': str(2 ** 64)})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+
+@override_settings(NOTES_PER_PAGE=7, NOTES_SYNC_WINDOW=0)
+class TestNoteChanges(TestCase):
+    NOTES_COUNT = 20
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор')
+        cls.reader = User.objects.create(username='Читатель')
+        Note.objects.bulk_create(
+            Note(
+                title=f'Заметка {index}',
+                text='Текст',
+                author=cls.author,
+                slug=f'note-{index}',
+            )
+            for index in range(cls.NOTES_COUNT)
+        )
+        Note.objects.create(
+            title='Чужая', text='Текст', author=cls.reader, slug='foreign'
+        )
+        cls.url = reverse('notes:changes')
+
+    def setUp(self):
+        self.client.force_login(self.author)
+
+    def sync(self, cursor=None):
+        """Забирает все изменения после курсора, страница за страницей."""
+        notes, deleted = [], []
+        while True:
+            # Сессия, пользователь, заметки и надгробия.
+            with self.assertNumQueries(4):
+                data = self.client.get(
+                    self.url, {'since': cursor} if cursor else {}
+                ).json()
+            notes.extend(note['slug'] for note in data['notes'])
+            deleted.extend(data['deleted'])
+            cursor = data['cursor']
+            if not data['more']:
+                return notes, deleted, cursor
+
+    def test_sync_returns_only_changes(self):
+        """
+        После полной синхронизации клиент получает только
+        изменённые заметки и id удалённых.
+        """
+        notes, deleted, cursor = self.sync()
+        self.assertEqual(
+            sorted(notes),
+            sorted(f'note-{index}' for index in range(self.NOTES_COUNT)),
+        )
+        self.assertEqual(deleted, [])
+        self.assertEqual(self.sync(cursor), ([], [], cursor))
+        removed = Note.objects.get(slug='note-3')
+        self.client.post(reverse('notes:delete', args=(removed.slug,)))
+        self.client.post(
+            reverse('notes:edit', args=('note-5',)),
+            {'title': 'Новый заголовок', 'text': 'Текст', 'slug': 'note-5'},
+        )
+        notes, deleted, _ = self.sync(cursor)
+        self.assertEqual(notes, ['note-5'])
+        self.assertEqual(deleted, [removed.id])
+
+    def test_tombstones_for_bulk_delete(self):
+        """Удаление пачкой тоже оставляет надгробия."""
+        Note.objects.filter(author=self.author).delete()
+        self.assertEqual(
+            NoteTombstone.objects.filter(author=self.author).count(),
+            self.NOTES_COUNT,
+        )
+
+    @override_settings(NOTES_SYNC_WINDOW=60)
+    def test_late_commit_not_missed(self):
+        """
+        Изменения свежее NOTES_SYNC_WINDOW не отдаются, поэтому запись,
+        зафиксированная позже со временем раньше курсора, не теряется.
+        """
+        Note.objects.filter(author=self.author).update(
+            updated=timezone.now() - timedelta(minutes=5)
+        )
+        Note.objects.filter(slug='note-1').update(updated=timezone.now())
+        notes, _, cursor = self.sync()
+        self.assertNotIn('note-1', notes)
+        self.assertEqual(len(notes), self.NOTES_COUNT - 1)
+        # Запись ждала блокировки и зафиксировалась после синхронизации.
+        Note.objects.filter(slug='note-2').update(
+            updated=timezone.now() - timedelta(minutes=2)
+        )
+        notes, _, _ = self.sync(cursor)
+        self.assertEqual(notes, ['note-2'])
+
+    def test_broken_cursor(self):
+        """
+        Испорченный курсор, в том числе с числами больше BIGINT,
+        приводит к ошибке 404.
+        """
+        for cursor in ('сломан', f'1-{2 ** 64}', f'{2 ** 62}-1'):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(self.url, {'since': cursor})
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
@@ -0,0 +1,276 @@
+import random
+import time
+from unittest import skipIf
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from pytils import translit
+
+from notes import slugs
+from notes.importer import import_notes
+from notes.models import Note, NoteTombstone, User
+from notes.search import search_notes
+from notes.sync import after
+
+USERS_COUNT = 50
+NOTES_PER_USER = 40
+CORPUS_SIZE = 20000
+DISTINCT_TITLES = 500
+SMALL_SEARCH_CORPUS = 1000
+LARGE_SEARCH_CORPUS = 20000
+SEARCH_RUNS = 5
+# Корпус растёт в двадцать раз, время поиска — не больше чем в пять.
+SEARCH_MAX_SLOWDOWN = 5
+IMPORT_NOTES_COUNT = 2000
+# Пачка умещается в один INSERT: Django на SQLite передаёт
+# в запрос не больше 999 параметров, по пять на заметку.
+IMPORT_BATCH_SIZE = 100
+
+
+def query_plan(queryset):
+    """Возвращает описание плана выполнения запроса."""
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return ' '.join(row[-1] for row in cursor.fetchall())
+
+
+@skipIf(
+    connection.vendor != 'sqlite',
+    'Планы запросов проверяются через EXPLAIN QUERY PLAN SQLite.'
+)
+class TestQueryPlans(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.bulk_create(
+            User(username=f'Пользователь {index}')
+            for index in range(USERS_COUNT)
+        )
+        Note.objects.bulk_create(
+            Note(
+                title='Заголовок',
+                text='Текст',
+                author=user,
+                slug=f'slug-{user.pk}-{index}',
+            )
+            for user in User.objects.all()
+            for index in range(NOTES_PER_USER)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        cls.author = User.objects.first()
+
+    def test_author_notes_use_index(self):
+        """Заметки пользователя выбираются по индексу (author, id)."""
+        plan = query_plan(
+            Note.objects.filter(author=self.author).order_by('id')
+        )
+        self.assertIn('note_author_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_changes_use_indexes(self):
+        """
+        Изменения после курсора читаются по индексам
+        (автор, время, id) без сортировки.
+        """
+        note = Note.objects.filter(author=self.author).last()
+        plan = query_plan(
+            Note.objects.filter(author=self.author).filter(
+                after('updated', note.updated, note.id, 'id')
+            ).order_by('updated', 'id')
+        )
+        self.assertIn('note_author_updated_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+        plan = query_plan(
+            NoteTombstone.objects.filter(author=self.author).filter(
+                after('deleted', note.updated, note.id, 'note_id')
+            ).order_by('deleted', 'note_id')
+        )
+        self.assertIn('tombstone_author_deleted_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_taken_slugs_use_unique_index(self):
+        """Занятые варианты slug пачки читаются диапазонами из индекса."""
+        lookup = slugs.candidates_lookup(
+            [f'slug-{self.author.pk}', 'zagolovok', 'drugoi'], 100
+        )
+        plan = query_plan(Note.objects.filter(lookup).values('slug'))
+        self.assertIn('MULTI-INDEX OR', plan)
+        self.assertNotIn('SCAN notes_note', plan)
+
+
+@skipIf(connection.vendor != 'sqlite', 'Проверяются настройки SQLite.')
+class TestSQLiteConnection(TestCase):
+
+    def test_connection_tuned(self):
+        """Подключения к SQLite получают PRAGMA из настроек проекта."""
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+
+
+class TestSlugifyBenchmark(SimpleTestCase):
+
+    @staticmethod
+    def make_corpus():
+        """Повторяющиеся заголовки на кириллице, латинице и вперемешку."""
+        rng = random.Random(0)
+        words = (
+            'Ежедневный', 'отчёт', 'Daily', 'log', 'Встреча', 'meeting',
+            'План', 'sprint', 'Заметка', 'todo', '&', 'Итоги', 'week',
+        )
+        titles = [
+            ' '.join(rng.sample(words, 3)) + f' {index}'
+            for index in range(DISTINCT_TITLES)
+        ]
+        return [rng.choice(titles) for _ in range(CORPUS_SIZE)]
+
+    def test_slugify_matches_pytils_and_is_faster(self):
+        """
+        На большом корпусе заголовков slug совпадают с pytils,
+        а средняя стоимость slug на заметку ниже.
+        """
+        corpus = self.make_corpus()
+        slugs.slugify.cache_clear()
+
+        start = time.perf_counter()
+        expected = [translit.slugify(title) for title in corpus]
+        pytils_cost = (time.perf_counter() - start) / CORPUS_SIZE
+
+        start = time.perf_counter()
+        received = [slugs.slugify(title) for title in corpus]
+        service_cost = (time.perf_counter() - start) / CORPUS_SIZE
+
+        self.assertEqual(received, expected)
+        self.assertLess(service_cost, pytils_cost)
+        ascii_titles = ['Daily log', 'todo & sprint: week #3', '  meeting  ']
+        for title in ascii_titles:
+            with self.subTest(title=title):
+                self.assertEqual(
+                    slugs.ascii_slugify(title), translit.slugify(title)
+                )
+
+
+@skipIf(connection.vendor != 'sqlite', 'Поиск FTS5 есть только у SQLite.')
+class TestSearchBenchmark(TestCase):
+    WORDS = (
+        'купить', 'молоко', 'встреча', 'отчёт', 'план', 'звонок',
+        'проект', 'задача', 'идея', 'книга', 'фильм', 'поездка',
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор')
+        cls.needle = Note.objects.create(
+            title='Редкая заметка', text='Про хамелеона', author=cls.author
+        )
+
+    def add_notes(self, count, rng):
+        start = Note.objects.count()
+        Note.objects.bulk_create(
+            (
+                Note(
+                    title=' '.join(rng.sample(self.WORDS, 2)),
+                    text=' '.join(rng.choices(self.WORDS, k=30)),
+                    author=self.author,
+                    slug=f'note-{start + index}',
+                )
+                for index in range(count)
+            ),
+            batch_size=1000,
+        )
+
+    def test_search_uses_full_text_index(self):
+        """Поиск читает индекс FTS5, а не просматривает все заметки."""
+        self.add_notes(SMALL_SEARCH_CORPUS, random.Random(0))
+        plan = query_plan(
+            search_notes(Note.objects.filter(author=self.author), 'хамелеон')
+        )
+        self.assertIn('VIRTUAL TABLE INDEX', plan)
+        self.assertIn('SEARCH notes_note USING INTEGER PRIMARY KEY', plan)
+
+    @staticmethod
+    def best_time(queryset):
+        timings = []
+        for _ in range(SEARCH_RUNS):
+            start = time.perf_counter()
+            result = list(queryset.all())
+            timings.append(time.perf_counter() - start)
+        return min(timings), result
+
+    def test_search_time_does_not_grow(self):
+        """
+        Поиск редкого слова идёт за одно время и при тысяче заметок,
+        и при двадцати тысячах.
+        """
+        rng = random.Random(0)
+        notes = Note.objects.filter(author=self.author)
+        timings = []
+        for count in (
+            SMALL_SEARCH_CORPUS, LARGE_SEARCH_CORPUS - SMALL_SEARCH_CORPUS
+        ):
+            self.add_notes(count, rng)
+            search_time, found = self.best_time(
+                search_notes(notes, 'хамелеон')
+            )
+            self.assertEqual(found, [self.needle])
+            timings.append(search_time)
+        small, large = timings
+        self.assertLess(large, small * SEARCH_MAX_SLOWDOWN)
+
+
+class TestImportBenchmark(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор')
+
+    @staticmethod
+    def make_rows(prefix):
+        """Заголовки повторяются, чтобы slug приходилось нумеровать."""
+        return [
+            {'title': f'{prefix} заметка {index % 50}', 'text': 'Текст'}
+            for index in range(IMPORT_NOTES_COUNT)
+        ]
+
+    def count_queries(self, load, rows):
+        with CaptureQueriesContext(connection) as queries:
+            load(rows)
+        return len(queries)
+
+    def save_per_row(self, rows):
+        for row in rows:
+            Note(author=self.author, **row).save()
+
+    def import_batched(self, rows):
+        for _ in import_notes(
+            enumerate(rows, start=1), self.author, IMPORT_BATCH_SIZE
+        ):
+            pass
+
+    def test_batched_import_queries(self):
+        """
+        Пакетный импорт делает постоянное число запросов на пачку,
+        а сохранение по одной — несколько на каждую заметку.
+        """
+        per_row_queries = self.count_queries(
+            self.save_per_row, self.make_rows('Первая')
+        )
+        batched_queries = self.count_queries(
+            self.import_batched, self.make_rows('Вторая')
+        )
+        batches = IMPORT_NOTES_COUNT // IMPORT_BATCH_SIZE
+        # Подбор slug, точка сохранения, вставка, её освобождение.
+        self.assertEqual(batched_queries, batches * 4)
+        self.assertGreaterEqual(per_row_queries, IMPORT_NOTES_COUNT * 4)
+        self.assertEqual(
+            Note.objects.filter(title__startswith='Вторая').values(
+                'slug'
+            ).distinct().count(),
+            IMPORT_NOTES_COUNT,
+        )
@@ -45,6 +45,7 @@ class TestRoutes(TestCase):
         for name in ('notes:add',
                      'notes:success',
                      'notes:list',
+                     'notes:export',
                      ):
             with self.subTest(name=name):
                 url = reverse(name)
@@ -89,6 +90,7 @@ class TestRoutes(TestCase):
             ('notes:add', None),
             ('notes:success', None),
             ('notes:list', None),
+            ('notes:export', None),
         )
         for name, arg in urls:
             with self.subTest(name=name, arg=arg):
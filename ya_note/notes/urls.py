@@ -11,5 +11,11 @@ urlpatterns = [
     path('note/<slug:slug>/', views.NoteDetail.as_view(), name='detail'),
     path('delete/<slug:slug>/', views.NoteDelete.as_view(), name='delete'),
     path('notes/', views.NotesList.as_view(), name='list'),
+    path('search/', views.NoteSearch.as_view(), name='search'),
+    path('api/notes/', views.NotesApi.as_view(), name='api'),
+    path(
+        'api/notes/changes/', views.NoteChanges.as_view(), name='changes'
+    ),
+    path('export/', views.NotesExport.as_view(), name='export'),
     path('done/', views.NoteSuccess.as_view(), name='success'),
 ]
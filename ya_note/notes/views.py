@@ -1,9 +1,18 @@
+import json
+
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db import IntegrityError, transaction
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.urls import reverse_lazy
 from django.views import generic
 
-from .forms import NoteForm
+from .export import JSONL, ZIP, export_jsonl, export_zip
+from .forms import WARNING, NoteBatchForm, NoteForm
 from .models import Note
+from .search import search_notes
+from .slugs import allocate_slugs
+from .sync import get_changes, parse_int
 
 
 class Home(generic.TemplateView):
@@ -53,7 +62,236 @@ class NotesList(NoteBase, generic.ListView):
     """Список всех заметок пользователя."""
     template_name = 'notes/list.html'
 
+    def get_queryset(self):
+        """
+        Заметки страницами по id, только поля, нужные шаблону.
+
+        Страница начинается после id из параметра after, а не со смещения,
+        поэтому и далёкие страницы читаются по индексу (author, id).
+        """
+        queryset = super().get_queryset().only(
+            'id', 'slug', 'title'
+        ).order_by('id')
+        after = self.request.GET.get('after')
+        if after:
+            try:
+                queryset = queryset.filter(id__gt=parse_int(after))
+            except ValueError:
+                raise Http404('Некорректный курсор.')
+        return queryset
+
+    def get_context_data(self, **kwargs):
+        notes = list(self.object_list[:settings.NOTES_PER_PAGE + 1])
+        next_cursor = None
+        if len(notes) > settings.NOTES_PER_PAGE:
+            notes = notes[:settings.NOTES_PER_PAGE]
+            next_cursor = notes[-1].id
+        return super().get_context_data(
+            object_list=notes, next_cursor=next_cursor, **kwargs
+        )
+
 
 class NoteDetail(NoteBase, generic.DetailView):
     """Заметка подробно."""
     template_name = 'notes/detail.html'
+
+
+class NoteSearch(NoteBase, generic.ListView):
+    """Поиск по заметкам пользователя."""
+    template_name = 'notes/search.html'
+
+    def get_paginate_by(self, queryset):
+        return settings.NOTES_PER_PAGE
+
+    def get_queryset(self):
+        return search_notes(
+            super().get_queryset().only('id', 'slug', 'title'),
+            self.request.GET.get('q', ''),
+        )
+
+    def get_context_data(self, **kwargs):
+        return super().get_context_data(
+            query=self.request.GET.get('q', ''), **kwargs
+        )
+
+
+def parse_id(value):
+    """Id заметки из JSON или None, если это не целое число."""
+    if isinstance(value, bool) or not isinstance(value, int):
+        return None
+    try:
+        return parse_int(value)
+    except ValueError:
+        return None
+
+
+def note_id(item):
+    return parse_id(item.get('id'))
+
+
+class NotesApi(NoteBase, generic.View):
+    """
+    JSON API заметок пользователя.
+
+    GET отдаёт заметки страницами по id (параметр after), POST
+    принимает пакет операций {"create": [...], "update": [...],
+    "delete": [...]} и выполняет его в одной транзакции
+    несколькими общими запросами.
+    """
+    FIELDS = ('id', 'title', 'text', 'slug')
+
+    def get(self, request, *args, **kwargs):
+        notes = self.get_queryset().order_by('id').values(*self.FIELDS)
+        after = request.GET.get('after')
+        if after:
+            try:
+                notes = notes.filter(id__gt=parse_int(after))
+            except ValueError:
+                return JsonResponse(
+                    {'errors': 'Некорректный курсор.'}, status=400
+                )
+        notes = list(notes[:settings.NOTES_PER_PAGE + 1])
+        next_cursor = None
+        if len(notes) > settings.NOTES_PER_PAGE:
+            notes = notes[:settings.NOTES_PER_PAGE]
+            next_cursor = notes[-1]['id']
+        return JsonResponse({'notes': notes, 'next': next_cursor})
+
+    def post(self, request, *args, **kwargs):
+        try:
+            batch = json.loads(request.body)
+            to_create = list(batch.get('create', ()))
+            to_update = list(batch.get('update', ()))
+            to_delete = [parse_id(pk) for pk in batch.get('delete', ())]
+            if None in to_delete:
+                raise ValueError('Некорректный id.')
+        except (AttributeError, TypeError, ValueError):
+            return JsonResponse({'errors': 'Некорректный пакет.'}, status=400)
+        if (
+            len(to_create) + len(to_update) + len(to_delete)
+            > settings.NOTES_API_BATCH_SIZE
+        ):
+            return JsonResponse(
+                {'errors': 'Слишком много операций в пакете.'}, status=400
+            )
+        existing = self.get_queryset().in_bulk([
+            note_id(item) for item in to_update
+            if isinstance(item, dict) and note_id(item) is not None
+        ])
+        errors = {}
+        created = self.validate(to_create, {}, 'create', errors)
+        updated = self.validate(to_update, existing, 'update', errors)
+        if not errors:
+            self.check_slugs(created + updated, to_delete, errors)
+        if errors:
+            return JsonResponse({'errors': errors}, status=400)
+        try:
+            with transaction.atomic():
+                deleted, _ = self.get_queryset().filter(
+                    id__in=to_delete
+                ).delete()
+                allocate_slugs(updated)
+                Note.objects.bulk_update(updated, ('title', 'text', 'slug'))
+                for note in created:
+                    note.author = request.user
+                Note.objects.bulk_create(created)
+        except IntegrityError:
+            return JsonResponse(
+                {'errors': 'Slug заняты другими заметками.'}, status=409
+            )
+        return JsonResponse({
+            'created': [note.slug for note in created],
+            'updated': [note.id for note in updated],
+            'deleted': deleted,
+        })
+
+    @staticmethod
+    def validate(items, existing, operation, errors):
+        """Проверяет заметки пакета правилами NoteForm."""
+        notes = []
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                errors[f'{operation}.{index}'] = 'Ожидается объект.'
+                continue
+            instance = None
+            if operation == 'update':
+                if note_id(item) is None:
+                    errors[f'{operation}.{index}'] = 'Некорректный id.'
+                    continue
+                instance = existing.get(note_id(item))
+                if instance is None:
+                    errors[f'{operation}.{index}'] = 'Заметка не найдена.'
+                    continue
+            form = NoteBatchForm(item, instance=instance)
+            if form.is_valid():
+                notes.append(form.save(commit=False))
+            else:
+                errors[f'{operation}.{index}'] = form.errors
+        return notes
+
+    @staticmethod
+    def check_slugs(notes, deleted_ids, errors):
+        """Ищет занятые slug для всего пакета одним запросом."""
+        slugs = [note.slug for note in notes if note.slug]
+        duplicates = {slug for slug in slugs if slugs.count(slug) > 1}
+        taken = set(
+            Note.objects.filter(slug__in=slugs).exclude(
+                id__in=[note.id for note in notes if note.id] + deleted_ids
+            ).values_list('slug', flat=True)
+        )
+        for slug in sorted(duplicates | taken):
+            errors[slug] = slug + WARNING
+
+
+class NoteChanges(NoteBase, generic.View):
+    """
+    Изменения заметок после курсора из параметра since.
+
+    Без курсора отдаются все заметки; клиент сохраняет курсор из
+    ответа и в следующий раз получает только изменения и id
+    удалённых заметок.
+    """
+
+    def get(self, request, *args, **kwargs):
+        notes, deleted, cursor, has_more = get_changes(
+            request.user,
+            request.GET.get('since'),
+            settings.NOTES_PER_PAGE,
+        )
+        return JsonResponse({
+            'notes': [
+                {field: getattr(note, field) for field in NotesApi.FIELDS}
+                for note in notes
+            ],
+            'deleted': deleted,
+            'cursor': cursor,
+            'more': has_more,
+        })
+
+
+class NotesExport(NoteBase, generic.View):
+    """
+    Все заметки пользователя одним файлом: JSON Lines или zip
+    с Markdown-файлами.
+
+    Ответ отдаётся потоком по мере чтения заметок из базы, поэтому
+    память процесса не зависит от их числа.
+    """
+    FORMATS = {
+        JSONL: (export_jsonl, 'application/jsonl; charset=utf-8'),
+        ZIP: (export_zip, 'application/zip'),
+    }
+
+    def get(self, request):
+        file_format = request.GET.get('format', JSONL)
+        if file_format not in self.FORMATS:
+            raise Http404('Неизвестный формат.')
+        export, content_type = self.FORMATS[file_format]
+        response = StreamingHttpResponse(
+            export(self.get_queryset(), settings.NOTES_EXPORT_CHUNK_SIZE),
+            content_type=content_type,
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="notes.{file_format}"'
+        )
+        return response
@@ -0,0 +1,31 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite для нескольких процессов, пишущих одновременно.
+
+    Дополнительные ключи OPTIONS:
+    pragmas — PRAGMA, которые выполняются при каждом подключении
+    (journal_mode=WAL, synchronous, mmap_size, busy_timeout);
+    transaction_mode — как начинать транзакции: DEFERRED, IMMEDIATE
+    или EXCLUSIVE. С IMMEDIATE транзакция сразу берёт блокировку
+    записи и при занятой базе ждёт busy_timeout. Отложенная
+    транзакция, начавшая с чтения, в той же ситуации сразу
+    получает «database is locked».
+    """
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = params.pop('pragmas', {})
+        self.transaction_mode = params.pop('transaction_mode', 'DEFERRED')
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f'BEGIN {self.transaction_mode}')
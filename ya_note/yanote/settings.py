@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 from django.urls import reverse_lazy
@@ -52,12 +53,47 @@ TEMPLATES = [
 WSGI_APPLICATION = 'yanote.wsgi.application'
 
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# База данных настраивается переменными окружения. По умолчанию это
+# SQLite в режиме WAL: чтение не ждёт записи, а пишущие транзакции
+# встают в очередь на busy_timeout вместо ошибки «database is locked».
+DB_CONN_MAX_AGE = int(os.environ.get('DJANGO_DB_CONN_MAX_AGE', 60))
+
+if os.environ.get('DJANGO_DB_ENGINE') == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DJANGO_DB_NAME', 'yanote'),
+            'USER': os.environ.get('DJANGO_DB_USER', ''),
+            'PASSWORD': os.environ.get('DJANGO_DB_PASSWORD', ''),
+            'HOST': os.environ.get('DJANGO_DB_HOST', ''),
+            'PORT': os.environ.get('DJANGO_DB_PORT', ''),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            # Пул соединений держит PgBouncer; в режиме transaction
+            # он не поддерживает серверные курсоры.
+            'DISABLE_SERVER_SIDE_CURSORS': bool(
+                os.environ.get('DJANGO_DB_PGBOUNCER')
+            ),
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'yanote.db_backends.sqlite3',
+            'NAME': os.environ.get('DJANGO_DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'OPTIONS': {
+                'transaction_mode': 'IMMEDIATE',
+                'pragmas': {
+                    'journal_mode': 'WAL',
+                    'synchronous': 'NORMAL',
+                    'mmap_size': 256 * 1024 * 1024,
+                    'busy_timeout': int(
+                        os.environ.get('DJANGO_DB_BUSY_TIMEOUT', 5000)
+                    ),
+                },
+            },
+        }
     }
-}
 
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -87,3 +123,11 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_URL = reverse_lazy('users:login')
 LOGIN_REDIRECT_URL = reverse_lazy('notes:home')
+
+NOTES_PER_PAGE = 100
+NOTES_API_BATCH_SIZE = 1000
+NOTES_EXPORT_CHUNK_SIZE = 2000
+# Время изменения заметки ставится до того, как запись дождётся
+# блокировки базы (до busy_timeout), поэтому синхронизация отдаёт
+# изменения не новее этого числа секунд.
+NOTES_SYNC_WINDOW = 10